@@ -0,0 +1,243 @@
+import atexit
+import datetime
+import gzip
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+import clients
+import metrics
+
+AUDIT_SINK = os.environ.get('AUDIT_SINK', 'gcs')
+AUDIT_BUCKET = os.environ.get('AUDIT_BUCKET', 'operative-connect-lite')
+AUDIT_LOCAL_DIR = os.environ.get('AUDIT_LOCAL_DIR', 'audit_logs')
+AUDIT_QUEUE_SIZE = int(os.environ.get('AUDIT_QUEUE_SIZE', '10000'))
+AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE', '500'))
+AUDIT_BATCH_BYTES = int(os.environ.get('AUDIT_BATCH_BYTES', str(1024 * 1024)))
+AUDIT_FLUSH_INTERVAL = float(os.environ.get('AUDIT_FLUSH_INTERVAL', '5'))
+AUDIT_SAMPLE_RATE = float(os.environ.get('AUDIT_SAMPLE_RATE', '1.0'))
+AUDIT_DROP_POLICY = os.environ.get('AUDIT_DROP_POLICY', 'drop_newest')
+AUDIT_BLOCK_TIMEOUT = float(os.environ.get('AUDIT_BLOCK_TIMEOUT', '0.05'))
+
+DROP_POLICIES = ('drop_newest', 'drop_oldest', 'block')
+
+# Records of each kind are written under their own folder, as before batching
+FOLDERS = {
+    'request': 'requests',
+    'response': 'responses'
+}
+
+class GCSSink:
+    """Writes audit batches as objects in a Cloud Storage bucket"""
+
+    def __init__(self, bucket_name):
+        self.bucket_name = bucket_name
+
+    def write(self, name, data):
+        blob = clients.get_storage_client().bucket(self.bucket_name).blob(name)
+        blob.content_encoding = 'gzip'
+        with metrics.timer('gcs', 'upload'):
+            blob.upload_from_string(data=data, content_type='application/x-ndjson')
+
+class LocalSink:
+    """Writes audit batches as files under a local directory, for tests and local runs"""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def write(self, name, data):
+        path = os.path.join(self.directory, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+
+class AuditWriter:
+    """Bounded audit queue drained by a background thread into compressed NDJSON batches"""
+
+    def __init__(self, sink, queue_size=AUDIT_QUEUE_SIZE, batch_size=AUDIT_BATCH_SIZE,
+                 batch_bytes=AUDIT_BATCH_BYTES, flush_interval=AUDIT_FLUSH_INTERVAL,
+                 sample_rate=AUDIT_SAMPLE_RATE, drop_policy=AUDIT_DROP_POLICY,
+                 block_timeout=AUDIT_BLOCK_TIMEOUT):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown audit drop policy: {drop_policy}")
+        self.sink = sink
+        self.batch_size = batch_size
+        self.batch_bytes = batch_bytes
+        self.flush_interval = flush_interval
+        self.sample_rate = sample_rate
+        self.drop_policy = drop_policy
+        self.block_timeout = block_timeout
+        self.stats = {'enqueued': 0, 'dropped': 0, 'sampled_out': 0, 'batches': 0, 'failed_batches': 0}
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._pending = []
+        self._pending_bytes = 0
+        self._pending_since = None
+        self._write_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    def is_sampled(self, audit_id):
+        """Decide deterministically per audit id, so a request and its response are kept or dropped together"""
+        if self.sample_rate >= 1:
+            return True
+        bucket = int(hashlib.md5(audit_id.encode('utf-8')).hexdigest()[:8], 16) / 0xFFFFFFFF
+        return bucket < self.sample_rate
+
+    def record(self, kind, audit_id, data, raw_fields=None):
+        """Queue an audit record without blocking the request; returns False if it was not queued
+
+        `raw_fields` maps field names to values that are already serialized
+        JSON, such as a response body, so they are not encoded twice.
+        """
+        if not self.is_sampled(audit_id):
+            self.stats['sampled_out'] += 1
+            return False
+
+        line = json.dumps({
+            'id': audit_id,
+            'type': kind,
+            'recorded_at': datetime.datetime.utcnow().isoformat(),
+            **data
+        }, default=str)
+        if raw_fields:
+            line = line[:-1] + ''.join(f", {json.dumps(name)}: {value}" for name, value in raw_fields.items()) + '}'
+
+        self._ensure_started()
+        if not self._put((kind, line)):
+            self.stats['dropped'] += 1
+            return False
+        self.stats['enqueued'] += 1
+        return True
+
+    def flush(self):
+        """Write everything queued so far, synchronously"""
+        while True:
+            try:
+                self._add_pending(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        self._write_pending()
+
+    def close(self):
+        """Stop the background flusher and write any remaining records"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def _put(self, item):
+        try:
+            if self.drop_policy == 'block':
+                self._queue.put(item, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            if self.drop_policy != 'drop_oldest':
+                return False
+
+        # Make room by discarding the oldest queued record
+        try:
+            self._queue.get_nowait()
+            self.stats['dropped'] += 1
+        except queue.Empty:
+            pass
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            return False
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='audit-flusher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            timeout = self.flush_interval
+            if self._pending_since is not None:
+                timeout = max(0, self._pending_since + self.flush_interval - time.monotonic())
+            try:
+                self._add_pending(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                pass
+
+            if self._batch_due():
+                self._write_pending()
+
+    def _add_pending(self, item):
+        with self._write_lock:
+            if self._pending_since is None:
+                self._pending_since = time.monotonic()
+            self._pending.append(item)
+            self._pending_bytes += len(item[1])
+
+    def _batch_due(self):
+        if not self._pending:
+            return False
+        return (len(self._pending) >= self.batch_size
+                or self._pending_bytes >= self.batch_bytes
+                or time.monotonic() - self._pending_since >= self.flush_interval)
+
+    def _write_pending(self):
+        with self._write_lock:
+            pending, self._pending = self._pending, []
+            self._pending_bytes = 0
+            self._pending_since = None
+
+            by_kind = {}
+            for kind, line in pending:
+                by_kind.setdefault(kind, []).append(line)
+
+            timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+            for kind, lines in by_kind.items():
+                folder = FOLDERS.get(kind, kind)
+                name = f"{folder}/{folder}_{timestamp}_{str(uuid.uuid4())[:8]}.ndjson.gz"
+                data = gzip.compress(("\n".join(lines) + "\n").encode('utf-8'))
+                try:
+                    self.sink.write(name, data)
+                    self.stats['batches'] += 1
+                except Exception as e:
+                    self.stats['failed_batches'] += 1
+                    self.stats['dropped'] += len(lines)
+                    print("Audit write error:", str(e))
+
+def create_sink(name=AUDIT_SINK):
+    if name == 'local':
+        return LocalSink(AUDIT_LOCAL_DIR)
+    if name == 'gcs':
+        return GCSSink(AUDIT_BUCKET)
+    raise ValueError(f"Unknown audit sink: {name}")
+
+_writer = AuditWriter(create_sink())
+atexit.register(_writer.close)
+
+def get_writer():
+    return _writer
+
+def set_sink(sink):
+    """Swap the audit sink (e.g. a LocalSink in tests), writing out anything already queued first"""
+    _writer.flush()
+    _writer.sink = sink
+
+def new_audit_id():
+    """Id shared by a request and its response, e.g. 2024-01-31_12-00-00_1a2b3c4d"""
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    return f"{timestamp}_{str(uuid.uuid4())[:8]}"
+
+def record_request(audit_id, request_data):
+    return _writer.record('request', audit_id, request_data)
+
+def record_response(audit_id, response_data, raw_fields=None):
+    return _writer.record('response', audit_id, response_data, raw_fields)
+
+def flush():
+    _writer.flush()
@@ -1,42 +1,15 @@
 import os
-from flask import Flask, make_response
-from flask_cors import CORS
 from werkzeug.security import generate_password_hash, check_password_hash
-import jwt
 import datetime
-from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
+import uuid
+import metrics
+import revocation
 import utils
 import database
+import auth_context
 
-# Initialize the Flask app
-app = Flask(__name__)
-
-# Define allowed origins
-ALLOWED_ORIGINS = os.environ.get('ALLOWED_ORIGINS', "http://ocl.sullhouse.com,http://localhost:5000,http://127.0.0.1:5000").split(',')
-
-# Configure CORS with specific origins and options
-CORS(app, resources={
-    r"/*": {
-        "origins": ALLOWED_ORIGINS,
-        "methods": ["GET", "POST", "OPTIONS"],
-        "allow_headers": ["Content-Type", "x-access-token"]
-    }
-})
-
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'default_secret_key')
 project_id = os.environ.get('GCP_PROJECT')
 
-# Initialize rate limiter
-limiter = Limiter(
-    key_func=get_remote_address,
-    app=app,
-    default_limits=[os.environ.get('RATE_LIMITS', "200 per day,50 per hour")]
-)
-
-# Token blacklist
-blacklisted_tokens = set()
-
 def get_user_credentials(username):
     return database.get_user_credentials(username)
 
@@ -65,7 +38,8 @@ def register(request):
         return {"error": {"code": "USERNAME_EXISTS", "message": "Username already exists"}}, 400
 
     # Create new user
-    hashed_password = generate_password_hash(password, method='pbkdf2:sha256')
+    with metrics.timer('pbkdf2', 'hash'):
+        hashed_password = generate_password_hash(password, method='pbkdf2:sha256')
     table_id = f"{project_id}.users.users"
     rows_to_insert = [{"username": username, "hashed_password": hashed_password}]
     errors = database.insert_rows(table_id, rows_to_insert)
@@ -95,15 +69,20 @@ def login(request):
 
     # Verify credentials
     stored_username, stored_hashed_password = database.get_user_credentials(username)
-    if not stored_username or not check_password_hash(stored_hashed_password, password):
+    if stored_username:
+        with metrics.timer('pbkdf2', 'verify'):
+            password_matches = check_password_hash(stored_hashed_password, password)
+    if not stored_username or not password_matches:
         return {"error": {"code": "INVALID_CREDENTIALS", "message": "Invalid credentials"}}, 401
 
     # Generate token
+    import jwt
     secret_key = utils.get_secret('SECRET_KEY')
     token = jwt.encode(
         {
             'username': username,
-            'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+            'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=1),
+            'jti': uuid.uuid4().hex
         },
         secret_key
     )
@@ -111,63 +90,40 @@ def login(request):
 
 def protected(request):
     # Validate token in headers
-    token = request.headers.get('x-access-token')
-    is_valid, error = utils.validate_token(token, blacklisted_tokens)
-    if not is_valid:
-        return {"error": {"code": "INVALID_TOKEN", "message": error}}, 401
+    context = auth_context.get_context(request)
+    if not context.is_authenticated:
+        return {"error": {"code": "INVALID_TOKEN", "message": context.error}}, 401
 
-    try:
-        data = jwt.decode(token, utils.get_secret('SECRET_KEY'), algorithms=["HS256"])
-        current_user = data['username']
+    current_user = context.claims.get('username')
+
+    # Validate extracted username
+    is_valid, error = utils.validate_username(current_user)
+    if not is_valid:
+        return {"error": {"code": "INVALID_USERNAME", "message": "Invalid username in token"}}, 401
         
-        # Validate extracted username
-        is_valid, error = utils.validate_username(current_user)
-        if not is_valid:
-            return {"error": {"code": "INVALID_USERNAME", "message": "Invalid username in token"}}, 401
-            
-        return {"message": f"Hello {current_user}, you are authorized to access this resource"}, 200
-    except Exception as e:
-        return {"error": {"code": "TOKEN_VALIDATION_ERROR", "message": f"Token validation error: {str(e)}"}}, 401
+    return {"message": f"Hello {current_user}, you are authorized to access this resource"}, 200
 
 def logout(request):
-    token = request.headers.get('x-access-token')
-    if token:
-        blacklisted_tokens.add(token)
-    response = make_response({"message": "Logged out successfully"}, 200)
-    response.set_cookie('token', '', expires=0)
-    return response
+    # Revoke the token for every instance until it expires
+    context = auth_context.get_context(request)
+    if not context.is_authenticated:
+        return {"error": {"code": "INVALID_TOKEN", "message": context.error}}, 401
+
+    auth_context.revoke(context)
+    return {"message": "Logged out successfully"}, 200
 
 def authorized(request):
     """Check if the request is authenticated based on the token in headers"""
-    # Get token from headers
-    if hasattr(request, 'headers'):
-        token = request.headers.get('x-access-token')
-    else:
-        headers = request.get('headers', {})
-        token = headers.get('x-access-token')
-
-    if not token:
-        return False
+    return auth_context.get_context(request).is_authenticated
 
-    try:
-        secret_key = utils.get_secret('SECRET_KEY')
-        jwt.decode(token, secret_key, algorithms=["HS256"])
-        return True
-    except Exception as e:
-        print("Token decode error:", str(e))
-        return False
-
-@limiter.limit(os.environ.get('REFRESH_RATE_LIMIT', "5 per minute"))
 def refresh(request):
     # Validate token in headers
-    token = request.headers.get('x-access-token')
-    is_valid, error = utils.validate_token(token, blacklisted_tokens)
-    if not is_valid:
-        return {"error": {"code": "INVALID_TOKEN", "message": error}}, 401
+    context = auth_context.get_context(request)
+    if not context.is_authenticated:
+        return {"error": {"code": "INVALID_TOKEN", "message": context.error}}, 401
 
     try:
-        data = jwt.decode(token, utils.get_secret('SECRET_KEY'), algorithms=["HS256"], options={"verify_exp": False})
-        current_user = data['username']
+        current_user = context.claims.get('username')
 
         # Validate extracted username
         is_valid, error = utils.validate_username(current_user)
@@ -175,10 +131,12 @@ def refresh(request):
             return {"error": {"code": "INVALID_USERNAME", "message": "Invalid username in token"}}, 401
 
         # Generate new token
+        import jwt
         new_token = jwt.encode(
             {
                 'username': current_user,
-                'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+                'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=1),
+                'jti': uuid.uuid4().hex
             },
             utils.get_secret('SECRET_KEY')
         )
@@ -187,10 +145,5 @@ def refresh(request):
         return {"error": {"code": "TOKEN_REFRESH_ERROR", "message": f"Token refresh error: {str(e)}"}}, 401
 
 def cleanup_expired_tokens():
-    """Cleanup expired tokens from the blacklist"""
-    current_time = datetime.datetime.utcnow()
-    expired_tokens = {token for token in blacklisted_tokens if jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"], options={"verify_exp": False})['exp'] < current_time}
-    blacklisted_tokens.difference_update(expired_tokens)
-
-if __name__ == '__main__':
-    app.run(debug=os.environ.get('FLASK_DEBUG', 'False') == 'True')
\ No newline at end of file
+    """Cleanup expired tokens from the revocation store"""
+    return revocation.purge()
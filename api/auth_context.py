@@ -0,0 +1,126 @@
+import hashlib
+import os
+import time
+import cache
+import metrics
+import revocation
+import secret_provider
+
+AUTH_CACHE_SIZE = int(os.environ.get('AUTH_CACHE_SIZE', '10000'))
+
+# Key under which the verified context is stored in the WSGI environ of a request
+CONTEXT_KEY = 'ocl.auth_context'
+
+# Tokens are issued for an hour; used to bound revocations of tokens without `exp`
+TOKEN_LIFETIME = 3600
+
+# Verified claims keyed by token hash; entries expire with the token's `exp`
+_verified_claims = cache.TTLCache(maxsize=AUTH_CACHE_SIZE)
+
+class AuthContext:
+    """Result of verifying the token of a single request"""
+
+    def __init__(self, token=None, claims=None, error=None):
+        self.token = token
+        self.claims = claims
+        self.error = error
+
+    @property
+    def is_authenticated(self):
+        return self.claims is not None
+
+    @property
+    def username(self):
+        if not self.claims:
+            return None
+        username = self.claims.get('username')
+        if not username or not isinstance(username, str):
+            return None
+        return username
+
+def get_token(request):
+    """Get the access token from the request headers"""
+    if hasattr(request, 'headers'):
+        return request.headers.get('x-access-token')
+    headers = request.get('headers', {})
+    return headers.get('x-access-token')
+
+def token_key(token):
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+def verify_token(token):
+    """Verify a token, serving repeat tokens from the verified-claims cache"""
+    if not token or not isinstance(token, str):
+        return None, "Token is required and must be a string"
+
+    key = token_key(token)
+    claims = _verified_claims.get(key)
+    if claims is not None:
+        return check_revoked(token, claims)
+
+    import jwt  # deferred to the first token check to keep cold starts short
+    try:
+        secret_key = secret_provider.get_secret('SECRET_KEY')
+        with metrics.timer('jwt', 'decode'):
+            claims = jwt.decode(token, secret_key, algorithms=["HS256"])
+    except jwt.ExpiredSignatureError:
+        return None, "Token has expired"
+    except jwt.InvalidTokenError:
+        return None, "Invalid token format"
+
+    if isinstance(claims.get('exp'), (int, float)):
+        _verified_claims.set(key, claims, expires_at=claims['exp'])
+    return check_revoked(token, claims)
+
+def cached_username(request):
+    """Username of an already verified token, without verifying anything; None if the token is not cached"""
+    token = get_token(request)
+    if not token or not isinstance(token, str):
+        return None
+    claims = _verified_claims.peek(token_key(token))
+    return AuthContext(token, claims).username
+
+def token_id(token, claims):
+    """Id under which a token is revoked: its `jti`, or its hash for tokens issued without one"""
+    jti = claims.get('jti')
+    if jti and isinstance(jti, str):
+        return jti
+    return token_key(token)
+
+def check_revoked(token, claims):
+    if revocation.is_revoked(token_id(token, claims)):
+        return None, "Token has been blacklisted"
+    return claims, None
+
+def attach(request):
+    """Verify the request's token once and store the context on the request"""
+    token = get_token(request)
+    claims, error = verify_token(token)
+    context = AuthContext(token, claims, error)
+    environ = getattr(request, 'environ', None)
+    if environ is not None:
+        environ[CONTEXT_KEY] = context
+    return context
+
+def get_context(request):
+    """Get the auth context attached to the request, verifying the token if needed"""
+    environ = getattr(request, 'environ', None)
+    if environ is not None and CONTEXT_KEY in environ:
+        return environ[CONTEXT_KEY]
+    return attach(request)
+
+def revoke(context):
+    """Revoke the verified token of a request until it expires"""
+    expires_at = context.claims.get('exp')
+    if not isinstance(expires_at, (int, float)):
+        expires_at = time.time() + TOKEN_LIFETIME
+    revocation.revoke(token_id(context.token, context.claims), expires_at)
+    forget(context.token)
+
+def forget(token):
+    """Drop a token from the verified-claims cache"""
+    if token:
+        _verified_claims.pop(token_key(token))
+
+def cache_stats():
+    return _verified_claims.stats()
@@ -0,0 +1,71 @@
+import os
+import threading
+
+project_id = os.environ.get('GCP_PROJECT')
+
+BIGQUERY_POOL_SIZE = int(os.environ.get('BIGQUERY_POOL_SIZE', '16'))
+BIGQUERY_MAX_RETRIES = int(os.environ.get('BIGQUERY_MAX_RETRIES', '3'))
+
+BIGQUERY_SCOPES = [
+    'https://www.googleapis.com/auth/bigquery',
+    'https://www.googleapis.com/auth/cloud-platform'
+]
+
+_bigquery_client = None
+_bigquery_lock = threading.Lock()
+
+def create_pooled_session(credentials, pool_size, max_retries=0):
+    """Create an authorized HTTP session that keeps up to `pool_size` connections alive"""
+    from google.auth.transport.requests import AuthorizedSession
+    from requests.adapters import HTTPAdapter
+
+    session = AuthorizedSession(credentials)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=max_retries)
+    session.mount('https://', adapter)
+    return session
+
+def create_bigquery_client():
+    """Create a BigQuery client on a pooled keep-alive HTTP session"""
+    import google.auth
+    from google.cloud import bigquery
+
+    credentials, default_project = google.auth.default(scopes=BIGQUERY_SCOPES)
+    return bigquery.Client(
+        project=project_id or default_project,
+        credentials=credentials,
+        _http=create_pooled_session(credentials, BIGQUERY_POOL_SIZE, BIGQUERY_MAX_RETRIES)
+    )
+
+def get_bigquery_client():
+    """Get the process-wide BigQuery client, creating it on first use"""
+    global _bigquery_client
+    if _bigquery_client is None:
+        with _bigquery_lock:
+            if _bigquery_client is None:
+                _bigquery_client = create_bigquery_client()
+    return _bigquery_client
+
+def set_bigquery_client(client):
+    """Inject a BigQuery client (e.g. a fake in tests); pass None to recreate the default on next use"""
+    global _bigquery_client
+    with _bigquery_lock:
+        _bigquery_client = client
+
+_storage_client = None
+_storage_lock = threading.Lock()
+
+def get_storage_client():
+    """Get the process-wide Cloud Storage client, creating it on first use"""
+    global _storage_client
+    if _storage_client is None:
+        with _storage_lock:
+            if _storage_client is None:
+                from google.cloud import storage
+                _storage_client = storage.Client()
+    return _storage_client
+
+def set_storage_client(client):
+    """Inject a Cloud Storage client (e.g. a fake in tests); pass None to recreate the default on next use"""
+    global _storage_client
+    with _storage_lock:
+        _storage_client = client
@@ -0,0 +1,88 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+LOOKUP_WORKERS = int(os.environ.get('LOOKUP_WORKERS', '8'))
+
+_executor = None
+_executor_lock = threading.Lock()
+_local = threading.local()
+
+class Task:
+    """A call to run once the tasks it needs have finished; their results are passed as keyword arguments"""
+
+    def __init__(self, fn, *args, needs=()):
+        self.fn = fn
+        self.args = args
+        self.needs = tuple(needs)
+
+def task(fn, *args, needs=()):
+    return Task(fn, *args, needs=needs)
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=LOOKUP_WORKERS, thread_name_prefix='lookup',
+                                               initializer=_mark_worker)
+    return _executor
+
+def _mark_worker():
+    _local.is_worker = True
+
+def _call(tasks, name, results):
+    current = tasks[name]
+    return current.fn(*current.args, **{need: results[need] for need in current.needs})
+
+def run(tasks):
+    """Run named tasks concurrently as soon as their dependencies are done; returns {name: result}
+
+    The first exception raised by a task is re-raised once running tasks
+    have finished. Calls made from inside a task run sequentially, so nested
+    use cannot exhaust the pool.
+    """
+    for name, current in tasks.items():
+        unknown = [need for need in current.needs if need not in tasks]
+        if unknown:
+            raise ValueError(f"Task {name} needs unknown task {unknown[0]}")
+
+    results = {}
+    pending = dict(tasks)
+
+    if getattr(_local, 'is_worker', False) or len(tasks) == 1:
+        while pending:
+            ready = [name for name, current in pending.items() if all(need in results for need in current.needs)]
+            if not ready:
+                raise ValueError("Tasks have circular dependencies")
+            for name in ready:
+                results[name] = _call(tasks, name, results)
+                del pending[name]
+        return results
+
+    executor = get_executor()
+    running = {}
+    error = None
+    while pending or running:
+        if error is None:
+            for name in [name for name, current in pending.items() if all(need in results for need in current.needs)]:
+                running[executor.submit(_call, tasks, name, dict(results))] = name
+                del pending[name]
+        if not running:
+            if error is not None:
+                break
+            raise ValueError("Tasks have circular dependencies")
+
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            name = running.pop(future)
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                error = error or e
+        if error is not None:
+            pending.clear()
+
+    if error is not None:
+        raise error
+    return results
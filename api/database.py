@@ -1,115 +1,188 @@
-from google.cloud import bigquery
 import os
+import threading
+import concurrency
+import membership
+import metrics
+import org_cache
+from database_backend import organization_details
 
 project_id = os.environ.get('GCP_PROJECT')
 
-def execute_query(query):
-    client = bigquery.Client()
-    query_job = client.query(query)
-    return query_job.result()
+DATABASE_BACKEND = os.environ.get('DATABASE_BACKEND', 'bigquery')
+SQLITE_PATH = os.environ.get('SQLITE_PATH', 'ocl.sqlite3')
+INSERT_CHUNK_SIZE = int(os.environ.get('INSERT_CHUNK_SIZE', '500'))
 
+_backend = None
+_backend_lock = threading.Lock()
+
+def create_backend(name=DATABASE_BACKEND):
+    """Create the storage backend selected by DATABASE_BACKEND"""
+    if name == 'bigquery':
+        from database_bigquery import BigQueryBackend
+        return BigQueryBackend(project_id)
+    if name == 'sqlite':
+        from database_sqlite import SQLiteBackend
+        return SQLiteBackend(SQLITE_PATH)
+    raise ValueError(f"Unknown database backend: {name}")
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_backend()
+    return _backend
+
+def set_backend(backend):
+    """Swap the storage backend (e.g. an in-memory SQLiteBackend in tests)"""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+    org_cache.clear()
+    membership.invalidate()
+
+@metrics.timed('database', 'query')
+def execute_query(query, params=None, name=None):
+    return get_backend().execute_query(query, params, name=name)
+
+@metrics.timed('database', 'insert')
 def insert_rows(table_id, rows):
-    client = bigquery.Client()
-    errors = client.insert_rows_json(table_id, rows)
-    return errors
+    return get_backend().insert_rows(table_id, rows)
+
+def insert_rows_chunked(table_id, rows, chunk_size=INSERT_CHUNK_SIZE):
+    """Insert rows in concurrent chunks; returns {row index: error message} for rows that were not inserted"""
+    chunks = [rows[start:start + chunk_size] for start in range(0, len(rows), chunk_size)]
+    results = concurrency.run({
+        index: concurrency.task(insert_rows, table_id, chunk) for index, chunk in enumerate(chunks)
+    })
+
+    failed = {}
+    for index, errors in results.items():
+        offset = index * chunk_size
+        for error in errors or []:
+            messages = [detail.get('message') for detail in error.get('errors', []) if detail.get('message')]
+            failed[offset + error['index']] = '; '.join(messages) or "Insert was stopped by an invalid row in the same batch"
+    return failed
 
 def get_user_credentials(username):
-    query = f"""
-        SELECT username, hashed_password
-        FROM `{project_id}.users.users`
-        WHERE username = '{username}'
-    """
-    results = execute_query(query)
-    for row in results:
-        return row.username, row.hashed_password
-    return None, None
+    return get_backend().get_user_credentials(username)
 
 def get_organization_details(org_id):
-    query = f"""
-        SELECT organization_id, organization_name, created_by, created_at
-        FROM `{project_id}.organizations.organizations`
-        WHERE organization_id = '{org_id}'
-    """
-    results = execute_query(query)
-    for row in results:
-        return {
-            'organization_id': row.organization_id,
-            'organization_name': row.organization_name,
-            'created_by': row.created_by,
-            'created_at': row.created_at.isoformat()
-        }
-    return None
+    details = org_cache.get_details(org_id)
+    if details is None:
+        details = get_backend().get_organization_details(org_id)
+        org_cache.put_details(org_id, details)
+    return None if details is org_cache.NOT_FOUND else details
+
+def get_organizations_details(org_ids):
+    """Details for many organizations: cached ones plus a single backend lookup for the rest"""
+    details_by_id = {}
+    missing = []
+    for org_id in dict.fromkeys(org_ids):
+        details = org_cache.get_details(org_id)
+        if details is None:
+            missing.append(org_id)
+        elif details is not org_cache.NOT_FOUND:
+            details_by_id[org_id] = details
+    if missing:
+        for row in get_backend().list_organizations(missing):
+            details = organization_details(row)
+            org_cache.put_details(row.organization_id, details)
+            details_by_id[row.organization_id] = details
+    return details_by_id
 
 def check_organization_name_exists(org_name):
-    query = f"""
-        SELECT organization_id FROM `{project_id}.organizations.organizations`
-        WHERE organization_name = '{org_name}'
-    """
-    results = execute_query(query)
-    return list(results)
+    """Ids of organizations with this name; empty when the name is free"""
+    org_id = get_organization_id_by_name(org_name)
+    return [org_id] if org_id else []
 
 def check_user_access_to_organization(username, org_id):
-    query = f"""
-        SELECT organization_id FROM `{project_id}.users.user_organization`
-        WHERE username = '{username}' AND organization_id = '{org_id}'
-    """
-    results = execute_query(query)
-    return list(results)
+    return membership.has_access(username, org_id, get_backend().list_organization_ids_for_user)
 
 def check_organizations_exist(org_ids):
-    query = f"""
-        SELECT organization_id FROM `{project_id}.organizations.organizations`
-        WHERE organization_id IN ({','.join(f"'{org_id}'" for org_id in org_ids)})
-    """
-    results = execute_query(query)
-    return list(results)
+    """Ids of the given organizations that exist"""
+    existing = []
+    unknown = []
+    for org_id in dict.fromkeys(org_ids):
+        details = org_cache.get_details(org_id)
+        if details is None:
+            unknown.append(org_id)
+        elif details is not org_cache.NOT_FOUND:
+            existing.append(org_id)
+    if unknown:
+        existing.extend(row.organization_id for row in get_backend().check_organizations_exist(unknown))
+    return existing
 
 def check_partnership_exists(demand_org_id, supply_org_id):
-    query = f"""
-        SELECT partnership_id FROM `{project_id}.organizations.partnerships`
-        WHERE (demand_org_id = '{demand_org_id}' AND supply_org_id = '{supply_org_id}')
-        OR (demand_org_id = '{supply_org_id}' AND supply_org_id = '{demand_org_id}')
-    """
-    results = execute_query(query)
-    return list(results)
-
-def list_organizations_for_user(username):
-    query = f"""
-        SELECT o.* 
-        FROM `{project_id}.organizations.organizations` o
-        JOIN `{project_id}.users.user_organization` uo 
-        ON o.organization_id = uo.organization_id
-        WHERE uo.username = '{username}'
-    """
-    return execute_query(query)
-
-def list_partnerships_for_user(username):
-    query = f"""
-        SELECT DISTINCT
-            p.partnership_id,
-            d.organization_id as demand_org_id,
-            d.organization_name as demand_org_name,
-            d.created_by as demand_org_created_by,
-            d.created_at as demand_org_created_at,
-            s.organization_id as supply_org_id,
-            s.organization_name as supply_org_name,
-            s.created_by as supply_org_created_by,
-            s.created_at as supply_org_created_at
-        FROM `{project_id}.organizations.partnerships` p
-        JOIN `{project_id}.organizations.organizations` d ON p.demand_org_id = d.organization_id
-        JOIN `{project_id}.organizations.organizations` s ON p.supply_org_id = s.organization_id
-        JOIN `{project_id}.users.user_organization` uo 
-        ON uo.organization_id = d.organization_id OR uo.organization_id = s.organization_id
-        WHERE uo.username = '{username}'
-    """
-    return execute_query(query)
+    return get_backend().check_partnership_exists(demand_org_id, supply_org_id)
+
+def get_organization_ids_for_user(username):
+    return membership.get_organization_ids(username, get_backend().list_organization_ids_for_user)
+
+def reload_organization_ids_for_user(username):
+    return membership.reload(username, get_backend().list_organization_ids_for_user)
+
+def list_organizations_for_user(username, limit=None, after=None, name_prefix=None):
+    org_ids = get_organization_ids_for_user(username)
+    return get_backend().list_organizations(org_ids, limit=limit, after=after, name_prefix=name_prefix)
+
+def list_partnership_refs_for_user(username, limit=None, after=None, role=None):
+    org_ids = get_organization_ids_for_user(username)
+    return get_backend().list_partnership_refs(org_ids, limit=limit, after=after, role=role)
+
+def list_partnership_refs(org_ids):
+    return get_backend().list_partnership_refs(org_ids)
+
+def list_members(org_ids):
+    return get_backend().list_members(org_ids)
+
+def list_user_partnerships(username, limit=None, after=None, role=None):
+    return get_backend().list_user_partnerships(username, limit=limit, after=after, role=role)
+
+def rebuild_partnership_view():
+    return get_backend().rebuild_partnership_view()
 
 def get_organization_id_by_name(org_name):
-    query = f"""
-        SELECT organization_id FROM `{project_id}.organizations.organizations`
-        WHERE organization_name = '{org_name}'
-    """
-    results = execute_query(query)
-    for row in results:
-        return row.organization_id
-    return None
\ No newline at end of file
+    org_id = org_cache.get_id(org_name)
+    if org_id is None:
+        org_id = get_backend().get_organization_id_by_name(org_name)
+        org_cache.put_id(org_name, org_id)
+    return None if org_id is org_cache.NOT_FOUND else org_id
+
+def get_organization_ids_by_names(org_names):
+    """{name: id} for the names that exist: cached ones plus a single backend lookup for the rest"""
+    ids_by_name = {}
+    missing = []
+    for org_name in dict.fromkeys(org_names):
+        org_id = org_cache.get_id(org_name)
+        if org_id is None:
+            missing.append(org_name)
+        elif org_id is not org_cache.NOT_FOUND:
+            ids_by_name[org_name] = org_id
+    if missing:
+        found = {row.organization_name: row.organization_id for row in get_backend().list_organization_ids_by_names(missing)}
+        for org_name in missing:
+            org_cache.put_id(org_name, found.get(org_name))
+        ids_by_name.update(found)
+    return ids_by_name
+
+def find_existing_partnerships(pairs):
+    """The (demand_org_id, supply_org_id) pairs that already have a partnership, in either direction"""
+    pairs = list(pairs)
+    org_ids = {org_id for pair in pairs for org_id in pair}
+    existing = {frozenset((row.demand_org_id, row.supply_org_id)) for row in get_backend().list_partnerships_between(org_ids)}
+    return {pair for pair in pairs if frozenset(pair) in existing}
+
+def cache_organization(details):
+    """Populate the organization cache with a newly created organization"""
+    org_cache.put_details(details['organization_id'], details)
+
+def cache_membership(username, org_id):
+    """Record a new user to organization mapping in the membership index"""
+    membership.add(username, org_id)
+
+def membership_cache_stats():
+    return membership.stats()
+
+def organization_cache_stats():
+    return org_cache.stats()
@@ -0,0 +1,119 @@
+class DatabaseBackend:
+    """Interface implemented by every storage backend behind database.py
+
+    Lookups that the handlers only test for truthiness (check_*) return lists.
+    Listing functions return iterables of rows with attribute access, where
+    created_at columns are datetimes, matching BigQuery's Row objects.
+    """
+
+    # Tables addressed by insert_rows, as '<dataset>.<table>'
+    TABLES = (
+        'users.users',
+        'users.user_organization',
+        'organizations.organizations',
+        'organizations.partnerships',
+        'users.user_partnerships'
+    )
+
+    def execute_query(self, query, params=None, name=None):
+        """Run a query; `name` labels it in the query profiler"""
+        raise NotImplementedError
+
+    def insert_rows(self, table_id, rows):
+        """Insert rows into a table; returns a list of errors, empty on success"""
+        raise NotImplementedError
+
+    def get_user_credentials(self, username):
+        raise NotImplementedError
+
+    def get_organization_details(self, org_id):
+        raise NotImplementedError
+
+    def check_organization_name_exists(self, org_name):
+        raise NotImplementedError
+
+    def check_user_access_to_organization(self, username, org_id):
+        raise NotImplementedError
+
+    def check_organizations_exist(self, org_ids):
+        raise NotImplementedError
+
+    def check_partnership_exists(self, demand_org_id, supply_org_id):
+        raise NotImplementedError
+
+    def list_organization_ids_by_names(self, org_names):
+        """(organization_name, organization_id) rows for the names that exist"""
+        raise NotImplementedError
+
+    def list_partnerships_between(self, org_ids):
+        """(demand_org_id, supply_org_id) rows of partnerships with both sides among org_ids"""
+        raise NotImplementedError
+
+    def list_organization_ids_for_user(self, username):
+        """Ids of the organizations the user is mapped to"""
+        raise NotImplementedError
+
+    def list_organizations(self, org_ids, limit=None, after=None, name_prefix=None):
+        """Organizations among org_ids, optionally filtered by name prefix
+
+        With a limit, rows are ordered by (created_at, organization_id) and
+        start after the `after` pair of the previous page.
+        """
+        raise NotImplementedError
+
+    def list_partnership_refs(self, org_ids, limit=None, after=None, role=None):
+        """(partnership_id, demand_org_id, supply_org_id) rows where either side is one of the organizations
+
+        Demand and supply sides are queried separately and concatenated; when
+        both sides are queried, the supply side skips partnerships already
+        matched on the demand side, so every partnership appears once. `role`
+        restricts the match to the 'demand' or 'supply' side. With a limit,
+        each side returns at most `limit` rows ordered by partnership_id and
+        starting after `after`.
+        """
+        raise NotImplementedError
+
+    def get_organization_id_by_name(self, org_name):
+        raise NotImplementedError
+
+    def list_members(self, org_ids):
+        """(username, organization_id) rows of the users mapped to the organizations"""
+        raise NotImplementedError
+
+    def list_user_partnerships(self, username, limit=None, after=None, role=None):
+        """Rows of the user's partnership view ordered by partnership_id, starting after `after`
+
+        A partnership has a row for each side (`role`) the user belongs to.
+        """
+        raise NotImplementedError
+
+    def rebuild_partnership_view(self):
+        """Recompute the whole partnership view from partnerships, organizations and memberships"""
+        raise NotImplementedError
+
+# Partnership columns matched against a user's organizations for each role filter
+ROLE_COLUMNS = {
+    None: ('demand_org_id', 'supply_org_id'),
+    'demand': ('demand_org_id',),
+    'supply': ('supply_org_id',)
+}
+
+# Columns of users.user_partnerships: one row per user, partnership and side the user belongs to,
+# with both organizations denormalized so listing needs no join
+PARTNERSHIP_VIEW_COLUMNS = (
+    'username', 'role', 'partnership_id',
+    'demand_org_id', 'demand_org_name', 'demand_org_created_by', 'demand_org_created_at',
+    'supply_org_id', 'supply_org_name', 'supply_org_created_by', 'supply_org_created_at'
+)
+
+def table_name(table_id):
+    """Strip the project from a table id: 'project.users.users' -> 'users.users'"""
+    return '.'.join(table_id.split('.')[-2:])
+
+def organization_details(row):
+    return {
+        'organization_id': row.organization_id,
+        'organization_name': row.organization_name,
+        'created_by': row.created_by,
+        'created_at': row.created_at.isoformat()
+    }
@@ -0,0 +1,238 @@
+import datetime
+import os
+from google.cloud import bigquery
+import clients
+import query_profiler
+from database_backend import DatabaseBackend, ROLE_COLUMNS, organization_details
+
+project_id = os.environ.get('GCP_PROJECT')
+
+def query_parameter(name, value):
+    """Build a BigQuery query parameter, inferring its type from the Python value"""
+    if isinstance(value, (list, tuple, set)):
+        values = list(value)
+        return bigquery.ArrayQueryParameter(name, parameter_type(values[0]) if values else 'STRING', values)
+    return bigquery.ScalarQueryParameter(name, parameter_type(value), value)
+
+def parameter_type(value):
+    if isinstance(value, bool):
+        return 'BOOL'
+    if isinstance(value, int):
+        return 'INT64'
+    if isinstance(value, float):
+        return 'FLOAT64'
+    if isinstance(value, datetime.datetime):
+        return 'TIMESTAMP'
+    return 'STRING'
+
+class BigQueryBackend(DatabaseBackend):
+    """Stores everything in the BigQuery datasets of the GCP project"""
+
+    def __init__(self, project_id=project_id):
+        self.project_id = project_id
+
+    def execute_query(self, query, params=None, name=None):
+        client = clients.get_bigquery_client()
+        job_config = None
+        if params:
+            job_config = bigquery.QueryJobConfig(
+                query_parameters=[query_parameter(key, value) for key, value in params.items()]
+            )
+        with query_profiler.profile(name) as stats:
+            query_job = client.query(query, job_config=job_config)
+            results = query_job.result()
+            stats.update(query_profiler.job_stats(query_job))
+        return results
+
+    def insert_rows(self, table_id, rows):
+        client = clients.get_bigquery_client()
+        errors = client.insert_rows_json(table_id, rows)
+        return errors
+
+    def get_user_credentials(self, username):
+        query = f"""
+            SELECT username, hashed_password
+            FROM `{self.project_id}.users.users`
+            WHERE username = @username
+        """
+        results = self.execute_query(query, {'username': username}, name='get_user_credentials')
+        for row in results:
+            return row.username, row.hashed_password
+        return None, None
+
+    def get_organization_details(self, org_id):
+        query = f"""
+            SELECT organization_id, organization_name, created_by, created_at
+            FROM `{self.project_id}.organizations.organizations`
+            WHERE organization_id = @org_id
+        """
+        results = self.execute_query(query, {'org_id': org_id}, name='get_organization_details')
+        for row in results:
+            return organization_details(row)
+        return None
+
+    def check_organization_name_exists(self, org_name):
+        query = f"""
+            SELECT organization_id FROM `{self.project_id}.organizations.organizations`
+            WHERE organization_name = @org_name
+        """
+        results = self.execute_query(query, {'org_name': org_name}, name='check_organization_name_exists')
+        return list(results)
+
+    def check_user_access_to_organization(self, username, org_id):
+        query = f"""
+            SELECT organization_id FROM `{self.project_id}.users.user_organization`
+            WHERE username = @username AND organization_id = @org_id
+        """
+        results = self.execute_query(query, {'username': username, 'org_id': org_id},
+                                     name='check_user_access_to_organization')
+        return list(results)
+
+    def check_organizations_exist(self, org_ids):
+        query = f"""
+            SELECT organization_id FROM `{self.project_id}.organizations.organizations`
+            WHERE organization_id IN UNNEST(@org_ids)
+        """
+        results = self.execute_query(query, {'org_ids': list(org_ids)}, name='check_organizations_exist')
+        return list(results)
+
+    def check_partnership_exists(self, demand_org_id, supply_org_id):
+        query = f"""
+            SELECT partnership_id FROM `{self.project_id}.organizations.partnerships`
+            WHERE (demand_org_id = @demand_org_id AND supply_org_id = @supply_org_id)
+            OR (demand_org_id = @supply_org_id AND supply_org_id = @demand_org_id)
+        """
+        results = self.execute_query(query, {'demand_org_id': demand_org_id, 'supply_org_id': supply_org_id},
+                                     name='check_partnership_exists')
+        return list(results)
+
+    def list_organization_ids_by_names(self, org_names):
+        if not org_names:
+            return []
+        query = f"""
+            SELECT organization_name, organization_id FROM `{self.project_id}.organizations.organizations`
+            WHERE organization_name IN UNNEST(@org_names)
+        """
+        return self.execute_query(query, {'org_names': list(org_names)}, name='list_organization_ids_by_names')
+
+    def list_partnerships_between(self, org_ids):
+        if not org_ids:
+            return []
+        query = f"""
+            SELECT demand_org_id, supply_org_id FROM `{self.project_id}.organizations.partnerships`
+            WHERE demand_org_id IN UNNEST(@org_ids) AND supply_org_id IN UNNEST(@org_ids)
+        """
+        return self.execute_query(query, {'org_ids': list(org_ids)}, name='list_partnerships_between')
+
+    def list_organization_ids_for_user(self, username):
+        query = f"""
+            SELECT DISTINCT organization_id FROM `{self.project_id}.users.user_organization`
+            WHERE username = @username
+        """
+        results = self.execute_query(query, {'username': username}, name='list_organization_ids_for_user')
+        return [row.organization_id for row in results]
+
+    def list_organizations(self, org_ids, limit=None, after=None, name_prefix=None):
+        if not org_ids:
+            return []
+        params = {'org_ids': list(org_ids)}
+        query = f"""
+            SELECT o.*
+            FROM `{self.project_id}.organizations.organizations` o
+            WHERE o.organization_id IN UNNEST(@org_ids)
+        """
+        if name_prefix:
+            query += " AND STARTS_WITH(o.organization_name, @name_prefix)"
+            params['name_prefix'] = name_prefix
+        if after:
+            query += """ AND (o.created_at > @after_created_at
+                OR (o.created_at = @after_created_at AND o.organization_id > @after_id))"""
+            params['after_created_at'], params['after_id'] = after
+        if limit is not None:
+            query += " ORDER BY o.created_at, o.organization_id LIMIT @limit"
+            params['limit'] = limit
+        return self.execute_query(query, params, name='list_organizations')
+
+    def list_partnership_refs(self, org_ids, limit=None, after=None, role=None):
+        if not org_ids:
+            return []
+        params = {'org_ids': list(org_ids)}
+        conditions = ""
+        if after:
+            conditions = " AND partnership_id > @after"
+            params['after'] = after
+        page = ""
+        if limit is not None:
+            page = " ORDER BY partnership_id LIMIT @limit"
+            params['limit'] = limit
+
+        sides = []
+        for column in ROLE_COLUMNS[role]:
+            # Partnerships matched on an earlier side are not repeated
+            exclusions = "".join(f" AND {matched} NOT IN UNNEST(@org_ids)" for matched in ROLE_COLUMNS[role][:len(sides)])
+            sides.append(f"""
+            SELECT * FROM (
+                SELECT partnership_id, demand_org_id, supply_org_id
+                FROM `{self.project_id}.organizations.partnerships`
+                WHERE {column} IN UNNEST(@org_ids){exclusions}{conditions}{page}
+            )""")
+        query = "\n            UNION ALL".join(sides)
+        if limit is not None:
+            # Each side is limited on its own; only the first `limit` of the union are contiguous in id order
+            query += "\n            ORDER BY partnership_id LIMIT @limit"
+        return self.execute_query(query, params, name='list_partnership_refs')
+
+    def get_organization_id_by_name(self, org_name):
+        query = f"""
+            SELECT organization_id FROM `{self.project_id}.organizations.organizations`
+            WHERE organization_name = @org_name
+        """
+        results = self.execute_query(query, {'org_name': org_name}, name='get_organization_id_by_name')
+        for row in results:
+            return row.organization_id
+        return None
+
+    def list_members(self, org_ids):
+        if not org_ids:
+            return []
+        query = f"""
+            SELECT DISTINCT username, organization_id FROM `{self.project_id}.users.user_organization`
+            WHERE organization_id IN UNNEST(@org_ids)
+        """
+        return self.execute_query(query, {'org_ids': list(org_ids)}, name='list_members')
+
+    def list_user_partnerships(self, username, limit=None, after=None, role=None):
+        params = {'username': username}
+        query = f"""
+            SELECT * FROM `{self.project_id}.users.user_partnerships`
+            WHERE username = @username
+        """
+        if role:
+            query += " AND role = @role"
+            params['role'] = role
+        if after:
+            query += " AND partnership_id > @after"
+            params['after'] = after
+        query += " ORDER BY partnership_id"
+        if limit is not None:
+            query += " LIMIT @limit"
+            params['limit'] = limit
+        return self.execute_query(query, params, name='list_user_partnerships')
+
+    def rebuild_partnership_view(self):
+        # Clustering keeps a user's rows together, so a listing scans only that user's blocks
+        sides = [f"""
+            SELECT uo.username, '{role}' AS role, p.partnership_id,
+                d.organization_id AS demand_org_id, d.organization_name AS demand_org_name,
+                d.created_by AS demand_org_created_by, d.created_at AS demand_org_created_at,
+                s.organization_id AS supply_org_id, s.organization_name AS supply_org_name,
+                s.created_by AS supply_org_created_by, s.created_at AS supply_org_created_at
+            FROM `{self.project_id}.organizations.partnerships` p
+            JOIN `{self.project_id}.organizations.organizations` d ON d.organization_id = p.demand_org_id
+            JOIN `{self.project_id}.organizations.organizations` s ON s.organization_id = p.supply_org_id
+            JOIN `{self.project_id}.users.user_organization` uo ON uo.organization_id = p.{role}_org_id""" for role in ('demand', 'supply')]
+        query = f"""
+            CREATE OR REPLACE TABLE `{self.project_id}.users.user_partnerships`
+            CLUSTER BY username, partnership_id AS
+        """ + "\n            UNION DISTINCT".join(sides)
+        self.execute_query(query, name='rebuild_partnership_view')
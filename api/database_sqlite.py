@@ -0,0 +1,307 @@
+import datetime
+import sqlite3
+import threading
+import query_profiler
+from database_backend import DatabaseBackend, PARTNERSHIP_VIEW_COLUMNS, ROLE_COLUMNS, table_name, organization_details
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS users (
+        username TEXT NOT NULL,
+        hashed_password TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_users_username ON users (username);
+
+    CREATE TABLE IF NOT EXISTS organizations (
+        organization_id TEXT NOT NULL,
+        organization_name TEXT NOT NULL,
+        created_by TEXT,
+        created_at TIMESTAMP
+    );
+    CREATE INDEX IF NOT EXISTS idx_organizations_id ON organizations (organization_id);
+    CREATE INDEX IF NOT EXISTS idx_organizations_name ON organizations (organization_name);
+
+    CREATE TABLE IF NOT EXISTS user_organization (
+        username TEXT NOT NULL,
+        organization_id TEXT NOT NULL,
+        status TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_user_organization_username ON user_organization (username, organization_id);
+    CREATE INDEX IF NOT EXISTS idx_user_organization_org ON user_organization (organization_id);
+
+    CREATE TABLE IF NOT EXISTS partnerships (
+        partnership_id TEXT NOT NULL,
+        demand_org_id TEXT NOT NULL,
+        supply_org_id TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_partnerships_id ON partnerships (partnership_id);
+    CREATE INDEX IF NOT EXISTS idx_partnerships_demand_supply ON partnerships (demand_org_id, supply_org_id);
+    CREATE INDEX IF NOT EXISTS idx_partnerships_supply_demand ON partnerships (supply_org_id, demand_org_id);
+
+    CREATE TABLE IF NOT EXISTS user_partnerships (
+        username TEXT NOT NULL,
+        role TEXT NOT NULL,
+        partnership_id TEXT NOT NULL,
+        demand_org_id TEXT,
+        demand_org_name TEXT,
+        demand_org_created_by TEXT,
+        demand_org_created_at TIMESTAMP,
+        supply_org_id TEXT,
+        supply_org_name TEXT,
+        supply_org_created_by TEXT,
+        supply_org_created_at TIMESTAMP
+    );
+    CREATE INDEX IF NOT EXISTS idx_user_partnerships_username ON user_partnerships (username, partnership_id);
+    CREATE INDEX IF NOT EXISTS idx_user_partnerships_role ON user_partnerships (username, role, partnership_id);
+"""
+
+# Every (user, partnership, side) from the normalized tables, as stored in user_partnerships
+PARTNERSHIP_VIEW_QUERY = " UNION ".join(f"""
+    SELECT uo.username, '{role}' AS role, p.partnership_id,
+        d.organization_id, d.organization_name, d.created_by, d.created_at,
+        s.organization_id, s.organization_name, s.created_by, s.created_at
+    FROM partnerships p
+    JOIN organizations d ON d.organization_id = p.demand_org_id
+    JOIN organizations s ON s.organization_id = p.supply_org_id
+    JOIN user_organization uo ON uo.organization_id = p.{role}_org_id""" for role in ('demand', 'supply'))
+
+# BigQuery table ids mapped to SQLite tables and their columns
+TABLES = {
+    'users.users': ('users', ('username', 'hashed_password')),
+    'users.user_organization': ('user_organization', ('username', 'organization_id', 'status')),
+    'organizations.organizations': ('organizations', ('organization_id', 'organization_name', 'created_by', 'created_at')),
+    'organizations.partnerships': ('partnerships', ('partnership_id', 'demand_org_id', 'supply_org_id')),
+    'users.user_partnerships': ('user_partnerships', PARTNERSHIP_VIEW_COLUMNS)
+}
+
+def in_placeholders(prefix, values, params):
+    """Named placeholders for an IN list, adding the values to params"""
+    names = []
+    for index, value in enumerate(values):
+        name = f"{prefix}_{index}"
+        params[name] = value
+        names.append(f":{name}")
+    return ', '.join(names)
+
+class Row:
+    """Query result row with attribute access; *created_at columns are parsed into datetimes"""
+
+    def __init__(self, columns, values):
+        for column, value in zip(columns, values):
+            if column.endswith('created_at') and isinstance(value, str):
+                value = datetime.datetime.fromisoformat(value)
+            setattr(self, column, value)
+
+    def keys(self):
+        return list(vars(self))
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+class SQLiteBackend(DatabaseBackend):
+    """Embedded SQLite store for local runs, integration tests and offline benchmarks"""
+
+    def __init__(self, path=':memory:'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript(SCHEMA)
+
+    def execute_query(self, query, params=None, name=None):
+        with query_profiler.profile(name), self._lock:
+            cursor = self._connection.execute(query, params or {})
+            columns = [column[0] for column in cursor.description or ()]
+            return [Row(columns, values) for values in cursor.fetchall()]
+
+    def insert_rows(self, table_id, rows):
+        if table_name(table_id) not in TABLES:
+            return [{'index': 0, 'errors': [{'reason': 'notFound', 'message': f"Table {table_id} not found"}]}]
+        table, columns = TABLES[table_name(table_id)]
+
+        errors = []
+        for index, row in enumerate(rows):
+            unknown = [key for key in row if key not in columns]
+            if unknown:
+                errors.append({'index': index, 'errors': [{'reason': 'invalid', 'message': f"no such field: {unknown[0]}"}]})
+        if errors:
+            # Like BigQuery, nothing is inserted and the valid rows are reported as stopped
+            invalid = {error['index'] for error in errors}
+            errors.extend(
+                {'index': index, 'errors': [{'reason': 'stopped', 'message': ''}]}
+                for index in range(len(rows)) if index not in invalid
+            )
+            return sorted(errors, key=lambda error: error['index'])
+
+        placeholders = ', '.join(f":{column}" for column in columns)
+        values = [{column: row.get(column) for column in columns} for row in rows]
+        with self._lock, self._connection:
+            self._connection.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", values)
+        return []
+
+    def get_user_credentials(self, username):
+        results = self.execute_query(
+            "SELECT username, hashed_password FROM users WHERE username = :username LIMIT 1",
+            {'username': username}, name='get_user_credentials'
+        )
+        for row in results:
+            return row.username, row.hashed_password
+        return None, None
+
+    def get_organization_details(self, org_id):
+        results = self.execute_query(
+            """SELECT organization_id, organization_name, created_by, created_at
+               FROM organizations WHERE organization_id = :org_id LIMIT 1""",
+            {'org_id': org_id}, name='get_organization_details'
+        )
+        for row in results:
+            return organization_details(row)
+        return None
+
+    def check_organization_name_exists(self, org_name):
+        return self.execute_query(
+            "SELECT organization_id FROM organizations WHERE organization_name = :org_name",
+            {'org_name': org_name}, name='check_organization_name_exists'
+        )
+
+    def check_user_access_to_organization(self, username, org_id):
+        return self.execute_query(
+            """SELECT organization_id FROM user_organization
+               WHERE username = :username AND organization_id = :org_id""",
+            {'username': username, 'org_id': org_id}, name='check_user_access_to_organization'
+        )
+
+    def check_organizations_exist(self, org_ids):
+        params = {}
+        placeholders = in_placeholders('org', org_ids, params)
+        if not placeholders:
+            return []
+        return self.execute_query(
+            f"SELECT organization_id FROM organizations WHERE organization_id IN ({placeholders})",
+            params, name='check_organizations_exist'
+        )
+
+    def check_partnership_exists(self, demand_org_id, supply_org_id):
+        return self.execute_query(
+            """SELECT partnership_id FROM partnerships
+               WHERE demand_org_id = :demand_org_id AND supply_org_id = :supply_org_id
+               UNION ALL
+               SELECT partnership_id FROM partnerships
+               WHERE demand_org_id = :supply_org_id AND supply_org_id = :demand_org_id""",
+            {'demand_org_id': demand_org_id, 'supply_org_id': supply_org_id}, name='check_partnership_exists'
+        )
+
+    def list_organization_ids_by_names(self, org_names):
+        params = {}
+        placeholders = in_placeholders('name', org_names, params)
+        if not placeholders:
+            return []
+        return self.execute_query(
+            f"SELECT organization_name, organization_id FROM organizations WHERE organization_name IN ({placeholders})",
+            params, name='list_organization_ids_by_names'
+        )
+
+    def list_partnerships_between(self, org_ids):
+        params = {}
+        placeholders = in_placeholders('org', org_ids, params)
+        if not placeholders:
+            return []
+        return self.execute_query(
+            f"""SELECT demand_org_id, supply_org_id FROM partnerships
+               WHERE demand_org_id IN ({placeholders}) AND supply_org_id IN ({placeholders})""",
+            params, name='list_partnerships_between'
+        )
+
+    def list_organization_ids_for_user(self, username):
+        results = self.execute_query(
+            "SELECT DISTINCT organization_id FROM user_organization WHERE username = :username",
+            {'username': username}, name='list_organization_ids_for_user'
+        )
+        return [row.organization_id for row in results]
+
+    def list_organizations(self, org_ids, limit=None, after=None, name_prefix=None):
+        params = {}
+        placeholders = in_placeholders('org', org_ids, params)
+        if not placeholders:
+            return []
+        query = f"SELECT * FROM organizations WHERE organization_id IN ({placeholders})"
+        if name_prefix:
+            query += " AND substr(organization_name, 1, length(:name_prefix)) = :name_prefix"
+            params['name_prefix'] = name_prefix
+        if after:
+            query += """ AND (created_at > :after_created_at
+                OR (created_at = :after_created_at AND organization_id > :after_id))"""
+            after_created_at, params['after_id'] = after
+            params['after_created_at'] = after_created_at.isoformat()
+        if limit is not None:
+            query += " ORDER BY created_at, organization_id LIMIT :limit"
+            params['limit'] = limit
+        return self.execute_query(query, params, name='list_organizations')
+
+    def list_partnership_refs(self, org_ids, limit=None, after=None, role=None):
+        params = {}
+        placeholders = in_placeholders('org', org_ids, params)
+        if not placeholders:
+            return []
+        conditions = ""
+        if after:
+            conditions = " AND partnership_id > :after"
+            params['after'] = after
+        page = ""
+        if limit is not None:
+            page = " ORDER BY partnership_id LIMIT :limit"
+            params['limit'] = limit
+
+        sides = []
+        for column in ROLE_COLUMNS[role]:
+            # Partnerships matched on an earlier side are not repeated
+            exclusions = "".join(f" AND {matched} NOT IN ({placeholders})" for matched in ROLE_COLUMNS[role][:len(sides)])
+            sides.append(
+                f"""SELECT * FROM (
+                   SELECT partnership_id, demand_org_id, supply_org_id FROM partnerships
+                   WHERE {column} IN ({placeholders}){exclusions}{conditions}{page})"""
+            )
+        query = " UNION ALL ".join(sides)
+        if limit is not None:
+            # Each side is limited on its own; only the first `limit` of the union are contiguous in id order
+            query += " ORDER BY partnership_id LIMIT :limit"
+        return self.execute_query(query, params, name='list_partnership_refs')
+
+    def get_organization_id_by_name(self, org_name):
+        results = self.execute_query(
+            "SELECT organization_id FROM organizations WHERE organization_name = :org_name LIMIT 1",
+            {'org_name': org_name}, name='get_organization_id_by_name'
+        )
+        for row in results:
+            return row.organization_id
+        return None
+
+    def list_members(self, org_ids):
+        params = {}
+        placeholders = in_placeholders('org', org_ids, params)
+        if not placeholders:
+            return []
+        return self.execute_query(
+            f"SELECT DISTINCT username, organization_id FROM user_organization WHERE organization_id IN ({placeholders})",
+            params, name='list_members'
+        )
+
+    def list_user_partnerships(self, username, limit=None, after=None, role=None):
+        params = {'username': username}
+        query = "SELECT * FROM user_partnerships WHERE username = :username"
+        if role:
+            query += " AND role = :role"
+            params['role'] = role
+        if after:
+            query += " AND partnership_id > :after"
+            params['after'] = after
+        query += " ORDER BY partnership_id"
+        if limit is not None:
+            query += " LIMIT :limit"
+            params['limit'] = limit
+        return self.execute_query(query, params, name='list_user_partnerships')
+
+    def rebuild_partnership_view(self):
+        with query_profiler.profile('rebuild_partnership_view'), self._lock, self._connection:
+            self._connection.execute("DELETE FROM user_partnerships")
+            self._connection.execute(
+                f"INSERT INTO user_partnerships ({', '.join(PARTNERSHIP_VIEW_COLUMNS)}) {PARTNERSHIP_VIEW_QUERY}"
+            )
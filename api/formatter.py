@@ -0,0 +1,103 @@
+import itertools
+import os
+
+# Column widths are taken from the first rows, so long lists render line by line without a second pass
+FORMAT_SAMPLE_ROWS = int(os.environ.get('FORMAT_SAMPLE_ROWS', '200'))
+FORMAT_MAX_COLUMN_WIDTH = int(os.environ.get('FORMAT_MAX_COLUMN_WIDTH', '40'))
+
+ORGANIZATION_COLUMNS = [
+    ('Name', lambda row: row.get('organization_name')),
+    ('ID', lambda row: row.get('organization_id')),
+    ('Created by', lambda row: row.get('created_by')),
+    ('Created at', lambda row: timestamp(row.get('created_at')))
+]
+
+PARTNERSHIP_COLUMNS = [
+    ('Demand organization', lambda row: (row.get('demand_organization') or {}).get('organization_name')),
+    ('Supply organization', lambda row: (row.get('supply_organization') or {}).get('organization_name')),
+    ('Partnership ID', lambda row: row.get('partnership_id'))
+]
+
+RESULT_COLUMNS = [
+    ('#', lambda row: row.get('index')),
+    ('Item', lambda row: ' / '.join(str(row[key]) for key in ('organization_name', 'demand_org_name', 'supply_org_name') if row.get(key))),
+    ('Status', lambda row: row.get('status')),
+    ('Details', lambda row: row.get('message') or row.get('organization_id') or row.get('partnership_id'))
+]
+
+def timestamp(value):
+    """ISO timestamps shortened to the minute"""
+    if isinstance(value, str) and 'T' in value:
+        return value.replace('T', ' ')[:16]
+    return value
+
+def cell(value, width=None):
+    text = '' if value is None else str(value)
+    if width is not None and len(text) > width:
+        return text[:width - 1] + '…'
+    return text
+
+def iter_table(rows, columns):
+    """Lines of a text table; widths come from the first FORMAT_SAMPLE_ROWS rows"""
+    rows = iter(rows)
+    sample = list(itertools.islice(rows, FORMAT_SAMPLE_ROWS))
+    widths = [
+        min(FORMAT_MAX_COLUMN_WIDTH, max([len(header)] + [len(cell(value(row))) for row in sample]))
+        for header, value in columns
+    ]
+    yield '  '.join(header.ljust(width) for (header, _), width in zip(columns, widths)).rstrip()
+    yield '  '.join('-' * width for width in widths)
+    for row in itertools.chain(sample, rows):
+        yield '  '.join(cell(value(row), width).ljust(width) for (_, value), width in zip(columns, widths)).rstrip()
+
+def iter_list(data, key, columns, label):
+    rows = data[key]
+    if not rows:
+        yield f"No {label} found."
+        return
+    yield f"{label.capitalize()} ({len(rows)}):"
+    yield from iter_table(rows, columns)
+    if data.get('next_cursor'):
+        yield "More results are available."
+
+def iter_message(data):
+    yield data['message']
+    for key, value in data.items():
+        if key != 'message' and value is not None:
+            yield f"  {key.replace('_', ' ').capitalize()}: {value}"
+
+def iter_error(data):
+    error = data['error']
+    yield f"Error ({error.get('code', 'UNKNOWN')}): {error.get('message', '')}"
+
+def iter_results(data):
+    yield f"{data.get('succeeded', 0)} succeeded, {data.get('failed', 0)} failed"
+    yield from iter_table(data['results'], RESULT_COLUMNS)
+
+def is_list_of_dicts(value):
+    return isinstance(value, list) and all(isinstance(item, dict) for item in value)
+
+def renderer(data):
+    """The renderer for a known response shape, or None"""
+    if not isinstance(data, dict):
+        return None
+    if is_list_of_dicts(data.get('organizations')):
+        return lambda: iter_list(data, 'organizations', ORGANIZATION_COLUMNS, 'organizations')
+    if is_list_of_dicts(data.get('partnerships')):
+        return lambda: iter_list(data, 'partnerships', PARTNERSHIP_COLUMNS, 'partnerships')
+    if is_list_of_dicts(data.get('results')):
+        return lambda: iter_results(data)
+    if isinstance(data.get('error'), dict):
+        return lambda: iter_error(data)
+    if isinstance(data.get('message'), str):
+        return lambda: iter_message(data)
+    return None
+
+def iter_lines(data):
+    """Lines rendering an API response, produced as they are needed; None if the shape is not recognized"""
+    render = renderer(data)
+    return render() if render else None
+
+def format_response(data):
+    lines = iter_lines(data)
+    return None if lines is None else "\n".join(lines)
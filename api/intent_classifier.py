@@ -0,0 +1,113 @@
+import math
+import os
+import re
+
+# Below these, the agent asks the LLM instead
+INTENT_CONFIDENCE_THRESHOLD = float(os.environ.get('INTENT_CONFIDENCE_THRESHOLD', '0.45'))
+INTENT_MIN_MARGIN = float(os.environ.get('INTENT_MIN_MARGIN', '0.1'))
+
+STOP_WORDS = {
+    'a', 'about', 'all', 'am', 'an', 'and', 'any', 'are', 'as', 'at', 'be', 'can', 'called', 'could', 'do', 'does',
+    'for', 'from', 'have', 'i', 'in', 'is', 'it', 'me', 'my', 'named', 'of', 'on', 'our', 'please', 'so', 'that',
+    'the', 'their', 'there', 'this', 'to', 'us', 'we', 'what', 'which', 'who', 'with', 'would', 'you', 'your'
+}
+
+# Queries closest to this intent are left to the LLM
+UNKNOWN_INTENT = 'unknown'
+
+# Words folded together so examples generalize to paraphrases
+SYNONYMS = {
+    'org': 'organization',
+    'organisation': 'organization',
+    'company': 'organization',
+    'business': 'organization',
+    'partnered': 'partner',
+    'show': 'list',
+    'display': 'list',
+    'see': 'list',
+    'view': 'list',
+    'get': 'list',
+    'add': 'create',
+    'make': 'create',
+    'new': 'create',
+    'start': 'create',
+    'setup': 'create',
+    'register': 'create',
+    'assign': 'map',
+    'grant': 'map',
+    'associate': 'map',
+    'link': 'connect',
+    'member': 'access'
+}
+
+EMAIL_PATTERN = re.compile(r'\S+@\S+\.\S+')
+WORD_PATTERN = re.compile(r'[a-z]+')
+
+def normalize(word):
+    if len(word) > 3 and word.endswith('ies'):
+        word = word[:-3] + 'y'
+    elif len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        word = word[:-1]
+    return SYNONYMS.get(word, word)
+
+def features(text):
+    """Unigrams, bigrams and the leading word of the normalized content words; email addresses become one token"""
+    text = EMAIL_PATTERN.sub(' emailaddress ', text.lower()).replace('set up', 'setup')
+    words = [normalize(word) for word in WORD_PATTERN.findall(text) if word not in STOP_WORDS]
+    # Requests are mostly imperative, so the leading word tells "partner A with B" from "partners"
+    leading = [f"^{words[0]}"] if words else []
+    return words + [f"{first} {second}" for first, second in zip(words, words[1:])] + leading
+
+class IntentClassifier:
+    """TF-IDF nearest-example classifier over the example phrases of each intent in intents.json"""
+
+    def __init__(self, intents, threshold=INTENT_CONFIDENCE_THRESHOLD, min_margin=INTENT_MIN_MARGIN):
+        self.threshold = threshold
+        self.min_margin = min_margin
+
+        examples = [(name, features(example)) for name, intent in intents.items() for example in intent.get('examples', ())]
+        document_counts = {}
+        for _, terms in examples:
+            for term in set(terms):
+                document_counts[term] = document_counts.get(term, 0) + 1
+        self.idf = {term: math.log((1 + len(examples)) / (1 + count)) + 1 for term, count in document_counts.items()}
+
+        # Inverted index from term to (example, weight), so a query only touches examples sharing a term
+        self.intents = []
+        self.index = {}
+        for position, (name, terms) in enumerate(examples):
+            self.intents.append(name)
+            for term, weight in self.vector(terms).items():
+                self.index.setdefault(term, []).append((position, weight))
+
+    def vector(self, terms):
+        weights = {}
+        for term in terms:
+            if term in self.idf:
+                weights[term] = weights.get(term, 0) + self.idf[term]
+        norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+        return {term: weight / norm for term, weight in weights.items()} if norm else {}
+
+    def scores(self, text):
+        """Best cosine similarity to an example of each intent, highest first"""
+        similarities = {}
+        for term, weight in self.vector(features(text)).items():
+            for position, example_weight in self.index[term]:
+                similarities[position] = similarities.get(position, 0) + weight * example_weight
+        best = {}
+        for position, similarity in similarities.items():
+            name = self.intents[position]
+            if similarity > best.get(name, 0):
+                best[name] = similarity
+        return sorted(best.items(), key=lambda item: item[1], reverse=True)
+
+    def classify(self, text):
+        """Returns (intent, confidence); intent is None when the query is not clear-cut"""
+        ranked = self.scores(text)
+        if not ranked:
+            return None, 0.0
+        intent, confidence = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        if intent == UNKNOWN_INTENT or confidence < self.threshold or confidence - runner_up < self.min_margin:
+            return None, confidence
+        return intent, confidence
@@ -0,0 +1,194 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import types
+import cache
+
+LLM_CACHE_PATH = os.environ.get('LLM_CACHE_PATH', 'llm_cache.sqlite3')
+LLM_CACHE_TTL = float(os.environ.get('LLM_CACHE_TTL', str(7 * 86400)))
+LLM_CACHE_MEMORY_SIZE = int(os.environ.get('LLM_CACHE_MEMORY_SIZE', '1024'))
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get('LLM_CACHE_MAX_ENTRIES', '100000'))
+
+def normalize_messages(messages):
+    """Messages with whitespace runs collapsed, so formatting differences share a cache entry"""
+    return [
+        {**message, 'content': ' '.join(message['content'].split())} if isinstance(message.get('content'), str) else message
+        for message in messages
+    ]
+
+def cache_key(model, messages, params):
+    payload = json.dumps({'model': model, 'messages': normalize_messages(messages), 'params': params},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def to_namespace(value):
+    """Attribute access over a decoded response, like the client's response objects"""
+    if isinstance(value, dict):
+        return types.SimpleNamespace(**{key: to_namespace(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [to_namespace(item) for item in value]
+    return value
+
+def response_data(response):
+    """The parts of a chat completion worth keeping"""
+    if hasattr(response, 'model_dump'):
+        return response.model_dump(mode='json', exclude_none=True)
+    return {
+        'model': getattr(response, 'model', None),
+        'choices': [
+            {'index': index, 'message': {'role': choice.message.role, 'content': choice.message.content}}
+            for index, choice in enumerate(response.choices)
+        ]
+    }
+
+class SQLiteStore:
+    """On-disk cache entries with expiry, trimmed to `max_entries` by least recent use"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            expires_at REAL,
+            used_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_llm_cache_used_at ON llm_cache (used_at);
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, max_entries=LLM_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript(self.SCHEMA)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock, self._connection:
+            row = self._connection.execute("SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                self._connection.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+            self._connection.execute("UPDATE llm_cache SET used_at = ? WHERE key = ?", (now, key))
+            return value
+
+    def set(self, key, value, expires_at=None):
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, used_at) VALUES (?, ?, ?, ?)",
+                (key, value, expires_at, now)
+            )
+            self._connection.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+            excess = self._connection.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._connection.execute(
+                    "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY used_at LIMIT ?)",
+                    (excess,)
+                )
+                self.evictions += excess
+
+    def clear(self):
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM llm_cache")
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+class CachedCompletions:
+    """Drop-in for `client.chat.completions` that memoizes deterministic (temperature 0) calls"""
+
+    def __init__(self, completions, store=None, memory_size=LLM_CACHE_MEMORY_SIZE, ttl=LLM_CACHE_TTL):
+        self.completions = completions
+        self.store = store
+        self.ttl = ttl
+        self.memory = cache.TTLCache(maxsize=memory_size, ttl=ttl)
+        self.counts = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'uncacheable': 0}
+        self._lock = threading.Lock()
+
+    def create(self, model, messages, **params):
+        if params.get('temperature') != 0 or params.get('stream'):
+            self._count('uncacheable')
+            return self.completions.create(model=model, messages=messages, **params)
+
+        key = cache_key(model, messages, params)
+        data = self.memory.get(key)
+        if data is not None:
+            self._count('memory_hits')
+            return to_namespace(data)
+
+        if self.store is not None:
+            stored = self.store.get(key)
+            if stored is not None:
+                data = json.loads(stored)
+                self.memory.set(key, data)
+                self._count('disk_hits')
+                return to_namespace(data)
+
+        self._count('misses')
+        response = self.completions.create(model=model, messages=messages, **params)
+        data = response_data(response)
+        self.memory.set(key, data)
+        if self.store is not None:
+            self.store.set(key, json.dumps(data), expires_at=time.time() + self.ttl if self.ttl else None)
+        return response
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.counts)
+        lookups = counts['memory_hits'] + counts['disk_hits'] + counts['misses']
+        return {
+            **counts,
+            'hit_ratio': (counts['memory_hits'] + counts['disk_hits']) / lookups if lookups else 0.0,
+            'memory_size': len(self.memory),
+            'disk_size': len(self.store) if self.store is not None else 0,
+            'disk_evictions': self.store.evictions if self.store is not None else 0
+        }
+
+class CachingClient:
+    """Wraps a chat client so `client.chat.completions.create` goes through the cache"""
+
+    def __init__(self, client, store=None, memory_size=LLM_CACHE_MEMORY_SIZE, ttl=LLM_CACHE_TTL):
+        self.client = client
+        self.chat = types.SimpleNamespace(completions=CachedCompletions(client.chat.completions, store, memory_size, ttl))
+
+    def stats(self):
+        return self.chat.completions.stats()
+
+class FakeCompletions:
+    def __init__(self, respond, latency):
+        self.respond = respond
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def create(self, model, messages, **params):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return to_namespace({
+            'model': model,
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': self.respond(messages)}}]
+        })
+
+class FakeClient:
+    """Offline stand-in for the OpenAI client; `respond(messages)` returns the reply text"""
+
+    def __init__(self, respond=None, latency=0.0):
+        self.chat = types.SimpleNamespace(completions=FakeCompletions(respond or (lambda messages: "Intent: unknown"), latency))
+
+    @property
+    def calls(self):
+        return self.chat.completions.calls
@@ -0,0 +1,43 @@
+import os
+import cache
+
+MEMBERSHIP_CACHE_SIZE = int(os.environ.get('MEMBERSHIP_CACHE_SIZE', '10000'))
+MEMBERSHIP_REFRESH_INTERVAL = float(os.environ.get('MEMBERSHIP_REFRESH_INTERVAL', '300'))
+
+# username -> frozenset of organization ids; entries are reloaded after the refresh interval
+_org_ids_by_user = cache.TTLCache(maxsize=MEMBERSHIP_CACHE_SIZE, ttl=MEMBERSHIP_REFRESH_INTERVAL)
+
+def get_organization_ids(username, load):
+    """Organization ids the user belongs to, loaded with `load(username)` on first use or after expiry"""
+    org_ids = _org_ids_by_user.get(username)
+    if org_ids is None:
+        org_ids = frozenset(load(username))
+        _org_ids_by_user.set(username, org_ids)
+    return org_ids
+
+def has_access(username, org_id, load):
+    """O(1) membership check; a miss reloads the user once in case another instance added the mapping"""
+    if org_id in get_organization_ids(username, load):
+        return True
+    invalidate(username)
+    return org_id in get_organization_ids(username, load)
+
+def reload(username, load):
+    """Organization ids the user belongs to, freshly loaded, e.g. to recheck many misses at once"""
+    invalidate(username)
+    return get_organization_ids(username, load)
+
+def add(username, org_id):
+    """Record a new mapping for a user that is already indexed"""
+    org_ids = _org_ids_by_user.peek(username)
+    if org_ids is not None:
+        _org_ids_by_user.set(username, org_ids | {org_id})
+
+def invalidate(username=None):
+    if username is None:
+        _org_ids_by_user.clear()
+    else:
+        _org_ids_by_user.pop(username)
+
+def stats():
+    return _org_ids_by_user.stats()
@@ -0,0 +1,214 @@
+import bisect
+import contextlib
+import functools
+import hmac
+import os
+import threading
+import time
+
+# When disabled, instrumented functions are left unwrapped and timers are no-ops
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+# Bearer token a scraper must send to read /metrics; the endpoint is not served without one
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Upper bounds in seconds, from a cached lookup to a slow BigQuery job
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name, labels):
+        return [(name, labels, self.value)]
+
+class Gauge(Counter):
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+class Histogram:
+    """Observation counts per bucket, with their sum, as Prometheus cumulative buckets"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def samples(self, name, labels):
+        with self._lock:
+            counts = list(self.counts)
+            total = self.sum
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            samples.append((f"{name}_bucket", labels + (('le', format_bound(bound)),), cumulative))
+        samples.append((f"{name}_sum", labels, total))
+        samples.append((f"{name}_count", labels, cumulative))
+        return samples
+
+TYPES = {Counter: 'counter', Gauge: 'gauge', Histogram: 'histogram'}
+
+class Registry:
+    """Metrics by name and label set; label sets are created on first use"""
+
+    def __init__(self):
+        self.families = {}
+        self.collectors = []
+        self._lock = threading.Lock()
+
+    def get(self, kind, name, help_text, labels):
+        key = tuple(sorted(labels.items()))
+        family = self.families.get(name)
+        metric = family['metrics'].get(key) if family else None
+        if metric is not None:
+            return metric
+        with self._lock:
+            family = self.families.setdefault(name, {'kind': kind, 'help': help_text, 'metrics': {}})
+            return family['metrics'].setdefault(key, kind())
+
+    def register_collector(self, collector):
+        """`collector()` returns [(name, type, help, [(labels dict, value)])], read at scrape time"""
+        self.collectors.append(collector)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            families = [(name, family, list(family['metrics'].items())) for name, family in sorted(self.families.items())]
+        lines = []
+        for name, family, metrics in families:
+            lines.append(f"# HELP {name} {family['help']}")
+            lines.append(f"# TYPE {name} {TYPES[family['kind']]}")
+            for labels, metric in sorted(metrics, key=lambda item: item[0]):
+                for sample_name, sample_labels, value in metric.samples(name, labels):
+                    lines.append(f"{sample_name}{format_labels(sample_labels)} {format_value(value)}")
+        for collector in self.collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                print("Metrics collector error:", str(e))
+                continue
+            for name, kind, help_text, samples in families:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{format_labels(tuple(sorted(labels.items())))} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+def format_bound(bound):
+    return '+Inf' if bound == float('inf') else repr(float(bound))
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + '}'
+
+def format_value(value):
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+registry = Registry()
+
+def counter(name, help_text, **labels):
+    return registry.get(Counter, name, help_text, labels)
+
+def gauge(name, help_text, **labels):
+    return registry.get(Gauge, name, help_text, labels)
+
+def histogram(name, help_text, **labels):
+    return registry.get(Histogram, name, help_text, labels)
+
+@contextlib.contextmanager
+def _timer(dependency, operation):
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        counter('ocl_dependency_errors_total', "Failed calls to a dependency",
+                dependency=dependency, operation=operation).inc()
+        raise
+    finally:
+        histogram('ocl_dependency_duration_seconds', "Time spent in calls to a dependency",
+                  dependency=dependency, operation=operation).observe(time.perf_counter() - start)
+
+def timer(dependency, operation):
+    """Context manager timing a call to a dependency, e.g. timer('bigquery', 'query')"""
+    if not METRICS_ENABLED:
+        return contextlib.nullcontext()
+    return _timer(dependency, operation)
+
+def timed(dependency, operation):
+    """Decorator timing every call of a function; returns the function unchanged when metrics are disabled"""
+    def decorate(func):
+        if not METRICS_ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _timer(dependency, operation):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def register_collector(collector):
+    registry.register_collector(collector)
+
+def cache_stats():
+    """Hit ratios and sizes of the in-process caches"""
+    import audit
+    import auth_context
+    import membership
+    import org_cache
+    import rate_limiter
+    import secret_provider
+
+    caches = {
+        'verified_claims': auth_context.cache_stats(),
+        'organization_ids': org_cache.stats()['ids_by_name'],
+        'organization_details': org_cache.stats()['details_by_id'],
+        'membership': membership.stats(),
+        'secrets': secret_provider.get_provider().stats()
+    }
+    return [
+        ('ocl_cache_hit_ratio', 'gauge', "Share of cache lookups served from the cache",
+         [({'cache': name}, stats['hit_ratio']) for name, stats in caches.items() if 'hit_ratio' in stats]),
+        ('ocl_cache_size', 'gauge', "Entries held in a cache",
+         [({'cache': name}, stats['size']) for name, stats in caches.items() if 'size' in stats]),
+        ('ocl_rate_limit_decisions_total', 'counter', "Requests allowed or limited by the rate limiter",
+         [({'decision': decision}, count) for decision, count in rate_limiter.stats().items()]),
+        ('ocl_audit_records_total', 'counter', "Audit writer activity",
+         [({'event': event}, count) for event, count in audit.get_writer().stats.items()])
+    ]
+
+if METRICS_ENABLED:
+    register_collector(cache_stats)
+
+def is_authorized_scrape(request):
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    return scheme.lower() == 'bearer' and hmac.compare_digest(token.encode('utf-8'), METRICS_TOKEN.encode('utf-8'))
+
+def metrics_endpoint(request):
+    """Prometheus scrape endpoint, for scrapers holding METRICS_TOKEN"""
+    from flask import Response
+    if not METRICS_ENABLED or not METRICS_TOKEN:
+        return {"error": {"code": "NOT_FOUND", "message": "Metrics are disabled"}}, 404
+    if not is_authorized_scrape(request):
+        return {"error": {"code": "INVALID_TOKEN", "message": "Metrics token is missing or invalid"}}, 401
+    return Response(registry.render(), content_type=CONTENT_TYPE), 200
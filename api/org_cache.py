@@ -0,0 +1,49 @@
+import os
+import cache
+
+ORG_CACHE_SIZE = int(os.environ.get('ORG_CACHE_SIZE', '10000'))
+ORG_CACHE_TTL = float(os.environ.get('ORG_CACHE_TTL', '600'))
+ORG_CACHE_NEGATIVE_TTL = float(os.environ.get('ORG_CACHE_NEGATIVE_TTL', '30'))
+
+# Cached marker for lookups that found no organization
+NOT_FOUND = object()
+
+_ids_by_name = cache.TTLCache(maxsize=ORG_CACHE_SIZE, ttl=ORG_CACHE_TTL)
+_details_by_id = cache.TTLCache(maxsize=ORG_CACHE_SIZE, ttl=ORG_CACHE_TTL)
+
+def get_id(org_name):
+    """Cached organization id for a name: the id, NOT_FOUND, or None on a cache miss"""
+    return _ids_by_name.get(org_name)
+
+def put_id(org_name, org_id):
+    if org_id:
+        _ids_by_name.set(org_name, org_id)
+    else:
+        _ids_by_name.set(org_name, NOT_FOUND, ttl=ORG_CACHE_NEGATIVE_TTL)
+
+def get_details(org_id):
+    """Cached organization details for an id: the details, NOT_FOUND, or None on a cache miss"""
+    return _details_by_id.get(org_id)
+
+def put_details(org_id, details):
+    if details:
+        _details_by_id.set(org_id, details)
+        _ids_by_name.set(details['organization_name'], org_id)
+    else:
+        _details_by_id.set(org_id, NOT_FOUND, ttl=ORG_CACHE_NEGATIVE_TTL)
+
+def invalidate(org_name=None, org_id=None):
+    if org_name is not None:
+        _ids_by_name.pop(org_name)
+    if org_id is not None:
+        _details_by_id.pop(org_id)
+
+def clear():
+    _ids_by_name.clear()
+    _details_by_id.clear()
+
+def stats():
+    return {
+        'ids_by_name': _ids_by_name.stats(),
+        'details_by_id': _details_by_id.stats()
+    }
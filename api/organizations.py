@@ -3,9 +3,15 @@ from datetime import datetime
 import uuid
 import utils
 import database
+import concurrency
+import partnership_listing
+import partnership_view
+import streaming
 
 project_id = os.environ.get('GCP_PROJECT')
 
+BULK_MAX_ITEMS = int(os.environ.get('BULK_MAX_ITEMS', '1000'))
+
 def get_organization_details(org_id):
     """Get organization details from BigQuery"""
     return database.get_organization_details(org_id)
@@ -44,36 +50,66 @@ def create_organization(request):
     errors = database.insert_rows(f"{project_id}.organizations.organizations", [org_insert])
     if errors:
         return {"message": "Failed to create organization"}, 500
+    database.cache_organization(org_insert)
 
-    # Map user to organization
+    # Map user to organization, only once the organization exists
     user_org_insert = {
         'username': username,
         'organization_id': org_id,
         'status': 'active'
     }
-    
+
     errors = database.insert_rows(f"{project_id}.users.user_organization", [user_org_insert])
     if errors:
         return {"message": "Failed to map user to organization"}, 500
+    database.cache_membership(username, org_id)
 
     return {"message": "Organization created successfully", "organization_id": org_id}, 200
 
+def organization_row(row):
+    return {
+        'organization_id': row.organization_id,
+        'organization_name': row.organization_name,
+        'created_by': row.created_by,
+        'created_at': row.created_at.isoformat()
+    }
+
 def list_organizations(request):
     username = utils.get_user_from_token(request)
     if not username:
         return {"message": "Unauthorized"}, 401
 
-    results = database.list_organizations_for_user(username)
-    organizations = []
-    for row in results:
-        organizations.append({
-            'organization_id': row.organization_id,
-            'organization_name': row.organization_name,
-            'created_by': row.created_by,
-            'created_at': row.created_at.isoformat()
-        })
+    name_prefix = request.args.get('name_prefix')
+
+    # Stream every matching organization straight from the result pages
+    if streaming.is_stream_request(request):
+        results = database.list_organizations_for_user(username, name_prefix=name_prefix)
+        return streaming.JSONStream("organizations", (organization_row(row) for row in results), {"next_cursor": None}), 200
+
+    page, error = utils.validate_page_params(request)
+    if error:
+        return {"message": error}, 400
+
+    after = None
+    if page['after']:
+        if len(page['after']) != 2:
+            return {"message": "Invalid cursor"}, 400
+        try:
+            after = (datetime.fromisoformat(page['after'][0]), page['after'][1])
+        except ValueError:
+            return {"message": "Invalid cursor"}, 400
+
+    # Fetch one extra row to know whether there is a next page
+    results = database.list_organizations_for_user(username, limit=page['limit'] + 1, after=after, name_prefix=name_prefix)
+    organizations = [organization_row(row) for row in results]
+
+    next_cursor = None
+    if len(organizations) > page['limit']:
+        organizations = organizations[:page['limit']]
+        last = organizations[-1]
+        next_cursor = utils.encode_cursor([last['created_at'], last['organization_id']])
     
-    return {"organizations": organizations}, 200
+    return {"organizations": organizations, "next_cursor": next_cursor}, 200
 
 def create_partnership(request):
     """Create partnership between two organizations"""
@@ -93,9 +129,22 @@ def create_partnership(request):
     if not demand_org_name or not supply_org_name:
         return {"message": "Both organization names are required"}, 400
     
-    # Get organization IDs from names
-    demand_org_id = database.get_organization_id_by_name(demand_org_name)
-    supply_org_id = database.get_organization_id_by_name(supply_org_name)
+    # Resolve both names concurrently, then run the access and existence checks concurrently
+    results = concurrency.run({
+        'demand_org_id': concurrency.task(database.get_organization_id_by_name, demand_org_name),
+        'supply_org_id': concurrency.task(database.get_organization_id_by_name, supply_org_name),
+        'has_access': concurrency.task(
+            lambda demand_org_id: bool(demand_org_id) and database.check_user_access_to_organization(username, demand_org_id),
+            needs=['demand_org_id']
+        ),
+        'partnership_exists': concurrency.task(
+            lambda demand_org_id, supply_org_id: bool(demand_org_id and supply_org_id and demand_org_id != supply_org_id)
+                and bool(database.check_partnership_exists(demand_org_id, supply_org_id)),
+            needs=['demand_org_id', 'supply_org_id']
+        )
+    })
+    demand_org_id = results['demand_org_id']
+    supply_org_id = results['supply_org_id']
     
     if not demand_org_id or not supply_org_id:
         return {"message": "One or both organizations do not exist"}, 400
@@ -104,11 +153,11 @@ def create_partnership(request):
         return {"message": "Demand and supply organizations must be different"}, 400
     
     # Verify user has access to demand organization
-    if not database.check_user_access_to_organization(username, demand_org_id):
+    if not results['has_access']:
         return {"message": "Unauthorized access to demand organization"}, 401
 
     # Check if partnership already exists
-    if database.check_partnership_exists(demand_org_id, supply_org_id):
+    if results['partnership_exists']:
         return {"message": "Partnership already exists between these organizations"}, 400
 
     # Create partnership
@@ -122,6 +171,7 @@ def create_partnership(request):
     errors = database.insert_rows(f"{project_id}.organizations.partnerships", [partnership_insert])
     if errors:
         return {"message": "Failed to create partnership"}, 500
+    partnership_view.add_partnerships([partnership_insert])
 
     return {"message": "Partnership created successfully", "partnership_id": partnership_id}, 200
 
@@ -131,26 +181,37 @@ def list_partnerships(request):
     if not username:
         return {"message": "Unauthorized"}, 401
 
-    results = database.list_partnerships_for_user(username)
-    partnerships = []
-    for row in results:
-        partnerships.append({
-            'partnership_id': row.partnership_id,
-            'demand_organization': {
-                'organization_id': row.demand_org_id,
-                'organization_name': row.demand_org_name,
-                'created_by': row.demand_org_created_by,
-                'created_at': row.demand_org_created_at.isoformat()
-            },
-            'supply_organization': {
-                'organization_id': row.supply_org_id,
-                'organization_name': row.supply_org_name,
-                'created_by': row.supply_org_created_by,
-                'created_at': row.supply_org_created_at.isoformat()
-            }
-        })
+    role = request.args.get('role')
+    if role not in (None, 'demand', 'supply'):
+        return {"message": "Role must be 'demand' or 'supply'"}, 400
+
+    # The precomputed view is a single read per page; otherwise refs are matched and hydrated
+    listing = partnership_view if partnership_view.is_read() else partnership_listing
+
+    # Stream every matching partnership, one chunk at a time
+    if streaming.is_stream_request(request):
+        partnerships = listing.iter_partnerships_for_user(username, role=role)
+        return streaming.JSONStream("partnerships", partnerships, {"next_cursor": None}), 200
+
+    page, error = utils.validate_page_params(request)
+    if error:
+        return {"message": error}, 400
+
+    after = None
+    if page['after']:
+        if len(page['after']) != 1:
+            return {"message": "Invalid cursor"}, 400
+        after = page['after'][0]
+
+    # Fetch one extra partnership to know whether there is a next page
+    partnerships = listing.list_partnerships_for_user(username, limit=page['limit'] + 1, after=after, role=role)
+
+    next_cursor = None
+    if len(partnerships) > page['limit']:
+        partnerships = partnerships[:page['limit']]
+        next_cursor = utils.encode_cursor([partnerships[-1]['partnership_id']])
     
-    return {"partnerships": partnerships}, 200
+    return {"partnerships": partnerships, "next_cursor": next_cursor}, 200
 
 def map_user_to_organization(request):
     """Map a user to an existing organization"""
@@ -167,11 +228,19 @@ def map_user_to_organization(request):
     if not org_name:
         return {"message": "Organization name is required"}, 400
 
-    # Get organization ID from name
-    org_id = database.get_organization_id_by_name(org_name)
+    # Resolve the name and load the user's memberships concurrently
+    results = concurrency.run({
+        'org_id': concurrency.task(database.get_organization_id_by_name, org_name),
+        'member_of': concurrency.task(database.get_organization_ids_for_user, username)
+    })
+    org_id = results['org_id']
     if not org_id:
         return {"message": "Organization does not exist"}, 400
 
+    # Mapping is idempotent; do not insert a duplicate membership row
+    if org_id in results['member_of']:
+        return {"message": "User mapped to organization successfully"}, 200
+
     # Map user to organization
     user_org_insert = {
         'username': username,
@@ -182,5 +251,235 @@ def map_user_to_organization(request):
     errors = database.insert_rows(f"{project_id}.users.user_organization", [user_org_insert])
     if errors:
         return {"message": "Failed to map user to organization"}, 500
+    database.cache_membership(username, org_id)
+    partnership_view.add_memberships(username, [org_id])
+
+    return {"message": "User mapped to organization successfully"}, 200
+
+def validate_bulk_items(data, key):
+    """Validate the list of items of a bulk request"""
+    items = data.get(key)
+    if not isinstance(items, list) or not items:
+        return None, f"'{key}' must be a non-empty list"
+    if len(items) > BULK_MAX_ITEMS:
+        return None, f"At most {BULK_MAX_ITEMS} items can be processed per request"
+    if not all(isinstance(item, dict) for item in items):
+        return None, f"Every item in '{key}' must be an object"
+    return items, None
+
+def bulk_response(results):
+    failed = sum(1 for result in results if result['status'] == 'error')
+    return {"results": results, "succeeded": len(results) - failed, "failed": failed}, 200
+
+def bulk_create_organizations(request):
+    """Create many organizations and map the user to each; failures are reported per item"""
+    username = utils.get_user_from_token(request)
+    if not username:
+        return {"message": "Unauthorized"}, 401
+
+    data, error = utils.validate_request_data(request)
+    if error:
+        return {"message": error}, 400
+
+    items, error = validate_bulk_items(data, 'organizations')
+    if error:
+        return {"message": error}, 400
+
+    results = [{"index": index, "status": "error"} for index in range(len(items))]
+    candidates = {}
+    for index, item in enumerate(items):
+        org_name = item.get('organization_name')
+        results[index]['organization_name'] = org_name
+        is_valid, error = utils.validate_organization_name(org_name)
+        if not is_valid:
+            results[index]['message'] = error
+        elif org_name in candidates:
+            results[index]['message'] = "Duplicate organization name in request"
+        else:
+            candidates[org_name] = index
+
+    # One set-based lookup for every name in the batch
+    existing = database.get_organization_ids_by_names(candidates)
+    for org_name in existing:
+        results[candidates.pop(org_name)]['message'] = "Organization name already exists"
+
+    created_at = datetime.utcnow().isoformat()
+    org_inserts = []
+    user_org_inserts = []
+    for org_name in candidates:
+        org_id = str(uuid.uuid4()).replace('-', '')[:6]  # Shorten to 6 characters with no dashes
+        org_inserts.append({
+            'organization_id': org_id,
+            'organization_name': org_name,
+            'created_by': username,
+            'created_at': created_at
+        })
+        user_org_inserts.append({
+            'username': username,
+            'organization_id': org_id,
+            'status': 'active'
+        })
+
+    # Memberships are only inserted for organizations that were created
+    org_failures = database.insert_rows_chunked(f"{project_id}.organizations.organizations", org_inserts)
+    created = []
+    for position, (org_insert, user_org_insert) in enumerate(zip(org_inserts, user_org_inserts)):
+        result = results[candidates[org_insert['organization_name']]]
+        if position in org_failures:
+            result['message'] = f"Failed to create organization: {org_failures[position]}"
+            continue
+        database.cache_organization(org_insert)
+        result['organization_id'] = org_insert['organization_id']
+        created.append((result, user_org_insert))
+
+    user_org_failures = database.insert_rows_chunked(
+        f"{project_id}.users.user_organization", [user_org_insert for _, user_org_insert in created]
+    )
+    for position, (result, user_org_insert) in enumerate(created):
+        if position in user_org_failures:
+            result['message'] = f"Failed to map user to organization: {user_org_failures[position]}"
+            continue
+        database.cache_membership(username, user_org_insert['organization_id'])
+        result['status'] = "created"
+
+    return bulk_response(results)
+
+def bulk_create_partnerships(request):
+    """Create many partnerships between named organizations; failures are reported per item"""
+    username = utils.get_user_from_token(request)
+    if not username:
+        return {"message": "Unauthorized"}, 401
+
+    data, error = utils.validate_request_data(request)
+    if error:
+        return {"message": error}, 400
+
+    items, error = validate_bulk_items(data, 'partnerships')
+    if error:
+        return {"message": error}, 400
+
+    # Resolve every name and the user's memberships with one lookup each
+    names = {name for item in items for name in (item.get('demand_org_name'), item.get('supply_org_name')) if isinstance(name, str)}
+    lookups = concurrency.run({
+        'ids_by_name': concurrency.task(database.get_organization_ids_by_names, names),
+        'member_of': concurrency.task(database.get_organization_ids_for_user, username)
+    })
+    ids_by_name = lookups['ids_by_name']
+    member_of = lookups['member_of']
+
+    # A demand organization missing from the cached memberships may have been mapped on another instance;
+    # reload them once for the whole batch rather than once per item
+    demand_org_ids = {ids_by_name.get(item.get('demand_org_name')) for item in items if isinstance(item.get('demand_org_name'), str)}
+    if any(org_id and org_id not in member_of for org_id in demand_org_ids):
+        member_of = database.reload_organization_ids_for_user(username)
+
+    results = [{"index": index, "status": "error"} for index in range(len(items))]
+    candidates = {}
+    for index, item in enumerate(items):
+        demand_org_name = item.get('demand_org_name')
+        supply_org_name = item.get('supply_org_name')
+        result = results[index]
+        result.update({'demand_org_name': demand_org_name, 'supply_org_name': supply_org_name})
+
+        if not demand_org_name or not supply_org_name:
+            result['message'] = "Both organization names are required"
+            continue
+        if not isinstance(demand_org_name, str) or not isinstance(supply_org_name, str):
+            result['message'] = "Organization names must be strings"
+            continue
+        demand_org_id = ids_by_name.get(demand_org_name)
+        supply_org_id = ids_by_name.get(supply_org_name)
+        if not demand_org_id or not supply_org_id:
+            result['message'] = "One or both organizations do not exist"
+        elif demand_org_id == supply_org_id:
+            result['message'] = "Demand and supply organizations must be different"
+        elif demand_org_id not in member_of:
+            result['message'] = "Unauthorized access to demand organization"
+        elif frozenset((demand_org_id, supply_org_id)) in candidates:
+            result['message'] = "Duplicate partnership in request"
+        else:
+            candidates[frozenset((demand_org_id, supply_org_id))] = (index, demand_org_id, supply_org_id)
+
+    # One set-based existence check for every remaining pair
+    existing = database.find_existing_partnerships((demand_org_id, supply_org_id) for _, demand_org_id, supply_org_id in candidates.values())
+    partnership_inserts = []
+    indexes = []
+    for index, demand_org_id, supply_org_id in candidates.values():
+        if (demand_org_id, supply_org_id) in existing:
+            results[index]['message'] = "Partnership already exists between these organizations"
+            continue
+        partnership_inserts.append({
+            'partnership_id': str(uuid.uuid4()).replace('-', '')[:6],
+            'demand_org_id': demand_org_id,
+            'supply_org_id': supply_org_id
+        })
+        indexes.append(index)
+
+    failures = database.insert_rows_chunked(f"{project_id}.organizations.partnerships", partnership_inserts)
+    for position, (index, partnership_insert) in enumerate(zip(indexes, partnership_inserts)):
+        if position in failures:
+            results[index]['message'] = f"Failed to create partnership: {failures[position]}"
+        else:
+            results[index]['status'] = "created"
+            results[index]['partnership_id'] = partnership_insert['partnership_id']
+    partnership_view.add_partnerships([
+        partnership_insert for position, partnership_insert in enumerate(partnership_inserts) if position not in failures
+    ])
+
+    return bulk_response(results)
+
+def bulk_map_user_to_organizations(request):
+    """Map the user to many existing organizations; failures are reported per item"""
+    username = utils.get_user_from_token(request)
+    if not username:
+        return {"message": "Unauthorized"}, 401
+
+    data, error = utils.validate_request_data(request)
+    if error:
+        return {"message": error}, 400
+
+    items, error = validate_bulk_items(data, 'organizations')
+    if error:
+        return {"message": error}, 400
+
+    names = {item.get('organization_name') for item in items if isinstance(item.get('organization_name'), str)}
+    lookups = concurrency.run({
+        'ids_by_name': concurrency.task(database.get_organization_ids_by_names, names),
+        'member_of': concurrency.task(database.get_organization_ids_for_user, username)
+    })
+
+    results = [{"index": index, "status": "error"} for index in range(len(items))]
+    user_org_inserts = []
+    indexes = []
+    for index, item in enumerate(items):
+        org_name = item.get('organization_name')
+        result = results[index]
+        result['organization_name'] = org_name
+        org_id = lookups['ids_by_name'].get(org_name) if isinstance(org_name, str) else None
+        if not org_name:
+            result['message'] = "Organization name is required"
+        elif not org_id:
+            result['message'] = "Organization does not exist"
+        elif org_id in lookups['member_of'] or any(insert['organization_id'] == org_id for insert in user_org_inserts):
+            # Mapping is idempotent; do not insert a duplicate membership row
+            result['status'] = "mapped"
+        else:
+            user_org_inserts.append({
+                'username': username,
+                'organization_id': org_id,
+                'status': 'active'
+            })
+            indexes.append(index)
+
+    failures = database.insert_rows_chunked(f"{project_id}.users.user_organization", user_org_inserts)
+    for position, (index, user_org_insert) in enumerate(zip(indexes, user_org_inserts)):
+        if position in failures:
+            results[index]['message'] = f"Failed to map user to organization: {failures[position]}"
+        else:
+            database.cache_membership(username, user_org_insert['organization_id'])
+            results[index]['status'] = "mapped"
+    partnership_view.add_memberships(username, [
+        user_org_insert['organization_id'] for position, user_org_insert in enumerate(user_org_inserts) if position not in failures
+    ])
 
-    return {"message": "User mapped to organization successfully"}, 200
\ No newline at end of file
+    return bulk_response(results)
@@ -0,0 +1,58 @@
+import database
+
+# Partnerships are hydrated in chunks so the organization lookup stays a single query per chunk
+HYDRATE_CHUNK_SIZE = 1000
+
+def hydrate(refs):
+    """Attach both organizations' details to partnership refs with one organization lookup"""
+    org_ids = set()
+    for ref in refs:
+        org_ids.add(ref.demand_org_id)
+        org_ids.add(ref.supply_org_id)
+    details_by_id = database.get_organizations_details(org_ids)
+
+    partnerships = []
+    for ref in refs:
+        demand = details_by_id.get(ref.demand_org_id)
+        supply = details_by_id.get(ref.supply_org_id)
+        if demand is None or supply is None:
+            # Skip partnerships that reference a missing organization, as the join did
+            continue
+        partnerships.append({
+            'partnership_id': ref.partnership_id,
+            'demand_organization': demand,
+            'supply_organization': supply
+        })
+    return partnerships
+
+def iter_partnerships(refs, chunk_size=HYDRATE_CHUNK_SIZE):
+    """Yield hydrated partnerships for refs, holding at most one chunk in memory"""
+    chunk = []
+    for ref in refs:
+        chunk.append(ref)
+        if len(chunk) >= chunk_size:
+            yield from hydrate(chunk)
+            chunk = []
+    if chunk:
+        yield from hydrate(chunk)
+
+def iter_partnerships_for_user(username, role=None):
+    """Stream every partnership of the user's organizations, reading refs page by page"""
+    return iter_partnerships(database.list_partnership_refs_for_user(username, role=role))
+
+def list_partnerships_for_user(username, limit=None, after=None, role=None):
+    """Partnerships where either side is one of the user's organizations, ordered by id when a limit is given"""
+    if limit is None:
+        return list(iter_partnerships(database.list_partnership_refs_for_user(username, after=after, role=role)))
+
+    partnerships = []
+    while len(partnerships) < limit:
+        # Refs to a missing organization are dropped by hydration, so read on until the page is full
+        wanted = limit - len(partnerships)
+        # Past the first `wanted` refs, ids are no longer contiguous; the next read resumes after them
+        refs = list(database.list_partnership_refs_for_user(username, limit=wanted, after=after, role=role))[:wanted]
+        partnerships.extend(iter_partnerships(refs))
+        if len(refs) < wanted:
+            break
+        after = refs[-1].partnership_id
+    return partnerships
@@ -0,0 +1,143 @@
+import os
+import sys
+import time
+import concurrency
+import database
+
+project_id = os.environ.get('GCP_PROJECT')
+
+# `off`; `maintain` keeps users.user_partnerships up to date on writes; `read` also lists partnerships from it.
+# Go from `maintain` to `read` once a rebuild has backfilled the table.
+PARTNERSHIP_VIEW = os.environ.get('PARTNERSHIP_VIEW', 'off')
+
+ROLES = ('demand', 'supply')
+
+def is_maintained():
+    return PARTNERSHIP_VIEW in ('maintain', 'read')
+
+def is_read():
+    return PARTNERSHIP_VIEW == 'read'
+
+def view_table():
+    return f"{project_id}.users.user_partnerships"
+
+def view_row(username, role, partnership_id, demand_org_id, supply_org_id, details_by_id):
+    row = {'username': username, 'role': role, 'partnership_id': partnership_id}
+    for side, org_id in (('demand', demand_org_id), ('supply', supply_org_id)):
+        details = details_by_id[org_id]
+        row.update({
+            f'{side}_org_id': org_id,
+            f'{side}_org_name': details['organization_name'],
+            f'{side}_org_created_by': details['created_by'],
+            f'{side}_org_created_at': details['created_at']
+        })
+    return row
+
+def write(rows):
+    failed = database.insert_rows_chunked(view_table(), rows)
+    if failed:
+        # The write itself succeeded; the view catches up on the next rebuild
+        print("Partnership view update error:", f"{len(failed)} of {len(rows)} rows not written")
+
+def add_partnerships(partnerships):
+    """Add view rows for every member of either side of newly created partnerships (dicts as inserted)"""
+    if not is_maintained() or not partnerships:
+        return
+    try:
+        write(partnership_rows(partnerships))
+    except Exception as e:
+        # The partnerships are already committed; the view catches up on the next rebuild
+        print("Partnership view update error:", str(e))
+
+def partnership_rows(partnerships):
+    org_ids = {partnership[f'{role}_org_id'] for partnership in partnerships for role in ROLES}
+    results = concurrency.run({
+        'members': concurrency.task(database.list_members, org_ids),
+        'details_by_id': concurrency.task(database.get_organizations_details, org_ids)
+    })
+    members_by_org = {}
+    for row in results['members']:
+        members_by_org.setdefault(row.organization_id, []).append(row.username)
+
+    return [
+        view_row(username, role, partnership['partnership_id'], partnership['demand_org_id'],
+                 partnership['supply_org_id'], results['details_by_id'])
+        for partnership in partnerships
+        for role in ROLES
+        for username in members_by_org.get(partnership[f'{role}_org_id'], ())
+        if partnership['demand_org_id'] in results['details_by_id'] and partnership['supply_org_id'] in results['details_by_id']
+    ]
+
+def add_memberships(username, org_ids):
+    """Add view rows for the existing partnerships of organizations the user was just mapped to"""
+    org_ids = set(org_ids)
+    if not is_maintained() or not org_ids:
+        return
+    try:
+        write(membership_rows(username, org_ids))
+    except Exception as e:
+        # The memberships are already committed; the view catches up on the next rebuild
+        print("Partnership view update error:", str(e))
+
+def membership_rows(username, org_ids):
+    refs = list(database.list_partnership_refs(org_ids))
+    details_by_id = database.get_organizations_details(
+        {org_id for ref in refs for org_id in (ref.demand_org_id, ref.supply_org_id)}
+    )
+    return [
+        view_row(username, role, ref.partnership_id, ref.demand_org_id, ref.supply_org_id, details_by_id)
+        for ref in refs
+        for role in ROLES
+        if getattr(ref, f'{role}_org_id') in org_ids
+        and ref.demand_org_id in details_by_id and ref.supply_org_id in details_by_id
+    ]
+
+def organization(row, side):
+    return {
+        'organization_id': getattr(row, f'{side}_org_id'),
+        'organization_name': getattr(row, f'{side}_org_name'),
+        'created_by': getattr(row, f'{side}_org_created_by'),
+        'created_at': getattr(row, f'{side}_org_created_at').isoformat()
+    }
+
+def unique_partnerships(rows):
+    """Partnerships from view rows ordered by partnership_id, once even when the user is on both sides"""
+    last_id = None
+    for row in rows:
+        if row.partnership_id != last_id:
+            last_id = row.partnership_id
+            yield {
+                'partnership_id': row.partnership_id,
+                'demand_organization': organization(row, 'demand'),
+                'supply_organization': organization(row, 'supply')
+            }
+
+def iter_partnerships_for_user(username, role=None):
+    """Stream every partnership of the user from the view"""
+    return unique_partnerships(database.list_user_partnerships(username, role=role))
+
+def list_partnerships_for_user(username, limit=None, after=None, role=None):
+    """Partnerships of the user from the view, ordered by id; same contract as partnership_listing"""
+    if limit is None:
+        return list(iter_partnerships_for_user(username, role=role))
+
+    partnerships = []
+    while len(partnerships) < limit:
+        # A partnership can have a row per side, so read twice what is missing
+        wanted = 2 * (limit - len(partnerships))
+        rows = list(database.list_user_partnerships(username, limit=wanted, after=after, role=role))
+        partnerships.extend(unique_partnerships(rows))
+        if len(rows) < wanted:
+            break
+        after = rows[-1].partnership_id
+    return partnerships[:limit]
+
+def rebuild():
+    """Recompute the view from the normalized tables; repairs rows missed by failed or racing writes"""
+    database.rebuild_partnership_view()
+
+if __name__ == '__main__':
+    # Repair job, e.g. from Cloud Scheduler or by hand: python partnership_view.py
+    start = time.perf_counter()
+    rebuild()
+    print(f"Rebuilt {view_table()} in {time.perf_counter() - start:.1f}s", file=sys.stderr)
@@ -0,0 +1,140 @@
+import collections
+import contextlib
+import json
+import os
+import threading
+import time
+import metrics
+
+QUERY_PROFILING = os.environ.get('QUERY_PROFILING', 'true').lower() in ('1', 'true', 'yes')
+# Queries slower than this are logged with their job statistics
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', '1000'))
+# Recent durations kept per query name for percentiles
+QUERY_PROFILE_WINDOW = int(os.environ.get('QUERY_PROFILE_WINDOW', '500'))
+
+# Job statistics summed per query name
+TOTALS = ('bytes_processed', 'bytes_billed', 'slot_ms', 'queue_ms', 'execution_ms')
+
+class QueryStats:
+    """Rolling aggregates of one named query"""
+
+    def __init__(self, window=QUERY_PROFILE_WINDOW):
+        self.count = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.totals = dict.fromkeys(TOTALS, 0)
+        self.recent_ms = collections.deque(maxlen=window)
+
+    def add(self, duration_ms, stats, error):
+        self.count += 1
+        self.errors += 1 if error else 0
+        self.cache_hits += 1 if stats.get('cache_hit') else 0
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+        for key in TOTALS:
+            self.totals[key] += stats.get(key) or 0
+        self.recent_ms.append(duration_ms)
+
+    def summary(self):
+        recent = sorted(self.recent_ms)
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'mean_ms': self.total_ms / self.count if self.count else 0.0,
+            'p50_ms': recent[len(recent) // 2] if recent else 0.0,
+            'p95_ms': recent[min(len(recent) - 1, int(len(recent) * 0.95))] if recent else 0.0,
+            'max_ms': self.max_ms,
+            'cache_hit_ratio': self.cache_hits / self.count if self.count else 0.0,
+            **self.totals
+        }
+
+_stats = {}
+_lock = threading.Lock()
+
+def record(name, duration_ms, stats=None, error=False):
+    """Add one execution of a named query; logs it when slower than SLOW_QUERY_THRESHOLD_MS"""
+    stats = stats or {}
+    name = name or 'unnamed'
+    with _lock:
+        query_stats = _stats.get(name)
+        if query_stats is None:
+            query_stats = _stats[name] = QueryStats()
+        query_stats.add(duration_ms, stats, error)
+    if duration_ms >= SLOW_QUERY_THRESHOLD_MS:
+        log_slow_query(name, duration_ms, stats, error)
+
+def log_slow_query(name, duration_ms, stats, error):
+    # One JSON object per line is picked up by Cloud Logging as a structured entry
+    print(json.dumps({
+        'severity': 'WARNING',
+        'message': f"Slow query {name}: {duration_ms:.0f}ms",
+        'query_name': name,
+        'duration_ms': round(duration_ms, 1),
+        'error': error,
+        **stats
+    }, default=str))
+
+@contextlib.contextmanager
+def _profile(name):
+    stats = {}
+    start = time.perf_counter()
+    try:
+        yield stats
+    except Exception:
+        record(name, (time.perf_counter() - start) * 1000, stats, error=True)
+        raise
+    record(name, (time.perf_counter() - start) * 1000, stats)
+
+def profile(name):
+    """Time a query; the backend adds its job statistics to the yielded dict"""
+    if not QUERY_PROFILING:
+        return contextlib.nullcontext({})
+    return _profile(name)
+
+def job_stats(job):
+    """Statistics of a finished BigQuery job, without another API call"""
+    stats = {
+        'job_id': getattr(job, 'job_id', None),
+        'bytes_processed': getattr(job, 'total_bytes_processed', None),
+        'bytes_billed': getattr(job, 'total_bytes_billed', None),
+        'slot_ms': getattr(job, 'slot_millis', None),
+        'cache_hit': getattr(job, 'cache_hit', None)
+    }
+    created, started, ended = (getattr(job, attribute, None) for attribute in ('created', 'started', 'ended'))
+    if created and started:
+        stats['queue_ms'] = (started - created).total_seconds() * 1000
+    if started and ended:
+        stats['execution_ms'] = (ended - started).total_seconds() * 1000
+    return stats
+
+def stats():
+    """Aggregates per query name, slowest total first"""
+    with _lock:
+        summaries = {name: query_stats.summary() for name, query_stats in _stats.items()}
+    return dict(sorted(summaries.items(), key=lambda item: item[1]['mean_ms'] * item[1]['count'], reverse=True))
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+def collect():
+    summaries = stats()
+    return [
+        ('ocl_query_executions_total', 'counter', "Executions of a named query",
+         [({'query': name}, summary['count']) for name, summary in summaries.items()]),
+        ('ocl_query_errors_total', 'counter', "Failed executions of a named query",
+         [({'query': name}, summary['errors']) for name, summary in summaries.items()]),
+        ('ocl_query_mean_duration_seconds', 'gauge', "Mean duration of a named query",
+         [({'query': name}, summary['mean_ms'] / 1000) for name, summary in summaries.items()]),
+        ('ocl_query_bytes_billed_total', 'counter', "Bytes billed by a named query",
+         [({'query': name}, summary['bytes_billed']) for name, summary in summaries.items()]),
+        ('ocl_query_slot_milliseconds_total', 'counter', "Slot time used by a named query",
+         [({'query': name}, summary['slot_ms']) for name, summary in summaries.items()]),
+        ('ocl_query_cache_hit_ratio', 'gauge', "Share of executions of a named query served from the BigQuery result cache",
+         [({'query': name}, summary['cache_hit_ratio']) for name, summary in summaries.items()])
+    ]
+
+if QUERY_PROFILING and metrics.METRICS_ENABLED:
+    metrics.register_collector(collect)
@@ -0,0 +1,132 @@
+import math
+import os
+import threading
+import time
+import cache
+
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', '100000'))
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+REDIS_KEY_PREFIX = 'ocl:ratelimit:'
+
+PERIODS = {
+    'second': 1,
+    'minute': 60,
+    'hour': 3600,
+    'day': 86400
+}
+
+class Limit:
+    """A token bucket of `count` requests refilled evenly over `period` seconds"""
+
+    def __init__(self, count, period, spec):
+        self.count = count
+        self.period = period
+        self.spec = spec
+
+    @property
+    def rate(self):
+        return self.count / self.period
+
+def parse_limits(value):
+    """Parse limits written as e.g. "200 per day,50 per hour" """
+    limits = []
+    for spec in (part.strip() for part in (value or '').split(',')):
+        if not spec:
+            continue
+        words = spec.split()
+        if len(words) != 3 or words[1] != 'per' or not words[0].isdigit() or words[2].rstrip('s') not in PERIODS:
+            raise ValueError(f"Invalid rate limit: {spec}")
+        limits.append(Limit(int(words[0]), PERIODS[words[2].rstrip('s')], spec))
+    return limits
+
+class MemoryBackend:
+    """Token buckets of this process; idle buckets are dropped once they would be full again"""
+
+    def __init__(self, maxsize=RATE_LIMIT_MAX_KEYS):
+        self._buckets = cache.TTLCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def take(self, key, limit):
+        """Take a token; returns (allowed, seconds until a token is available)"""
+        now = time.time()
+        with self._lock:
+            tokens, updated_at = self._buckets.peek(key, (limit.count, now))
+            tokens = min(limit.count, tokens + (now - updated_at) * limit.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets.set(key, (tokens, now), ttl=(limit.count - tokens) / limit.rate)
+        return allowed, 0 if allowed else (1 - tokens) / limit.rate
+
+# Refill and take from a bucket in one round trip, so concurrent instances cannot both spend the last token
+TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(bucket[1]) or capacity
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+class RedisBackend:
+    """Token buckets shared by every instance"""
+
+    def __init__(self, url):
+        self.url = url
+        self._script = None
+        self._lock = threading.Lock()
+
+    def get_script(self):
+        if self._script is None:
+            with self._lock:
+                if self._script is None:
+                    import redis
+                    self._script = redis.Redis.from_url(self.url).register_script(TAKE_SCRIPT)
+        return self._script
+
+    def take(self, key, limit):
+        allowed, tokens = self.get_script()(keys=[REDIS_KEY_PREFIX + key], args=[limit.count, limit.rate, time.time()])
+        if allowed:
+            return True, 0
+        return False, (1 - float(tokens)) / limit.rate
+
+def create_backend(name=RATE_LIMIT_BACKEND):
+    if name == 'memory':
+        return MemoryBackend()
+    if name == 'redis':
+        return RedisBackend(REDIS_URL)
+    raise ValueError(f"Unknown rate limit backend: {name}")
+
+_backend = create_backend()
+_stats = {'allowed': 0, 'limited': 0}
+
+def get_backend():
+    return _backend
+
+def set_backend(backend):
+    """Swap the counter backend (e.g. a fresh MemoryBackend in tests)"""
+    global _backend
+    _backend = backend
+
+def check(scope, identity, limits):
+    """Take a token from every limit of `scope` for `identity`; returns (allowed, retry_after seconds)"""
+    for limit in limits:
+        allowed, retry_after = _backend.take(f"{scope}|{limit.spec}|{identity}", limit)
+        if not allowed:
+            _stats['limited'] += 1
+            return False, math.ceil(retry_after)
+    _stats['allowed'] += 1
+    return True, 0
+
+def stats():
+    return dict(_stats)
@@ -0,0 +1,109 @@
+import heapq
+import math
+import os
+import threading
+import time
+
+REVOCATION_BACKEND = os.environ.get('REVOCATION_BACKEND', 'memory')
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+REDIS_KEY_PREFIX = 'ocl:revoked:'
+
+class MemoryStore:
+    """Revoked token ids of this process, with a heap of expiries so purging only touches expired entries"""
+
+    def __init__(self):
+        self._expiries = {}
+        self._heap = []
+        self._lock = threading.Lock()
+
+    def revoke(self, token_id, expires_at):
+        with self._lock:
+            if self._expiries.get(token_id, -math.inf) >= expires_at:
+                return
+            self._expiries[token_id] = expires_at
+            heapq.heappush(self._heap, (expires_at, token_id))
+
+    def is_revoked(self, token_id):
+        expires_at = self._expiries.get(token_id)
+        return expires_at is not None and time.time() < expires_at
+
+    def purge(self, now=None):
+        """Drop entries whose token has expired; returns how many were removed"""
+        now = time.time() if now is None else now
+        removed = 0
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                expires_at, token_id = heapq.heappop(self._heap)
+                # Skip heap entries superseded by a later revoke of the same id
+                if self._expiries.get(token_id) == expires_at:
+                    del self._expiries[token_id]
+                    removed += 1
+        return removed
+
+    def __len__(self):
+        return len(self._expiries)
+
+class RedisStore:
+    """Revoked token ids shared by every instance; Redis expires each entry together with its token"""
+
+    def __init__(self, url):
+        self.url = url
+        self._client = None
+        self._lock = threading.Lock()
+        # Revocations made here are answered without a round trip
+        self._local = MemoryStore()
+
+    def get_client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import redis
+                    self._client = redis.Redis.from_url(self.url)
+        return self._client
+
+    def revoke(self, token_id, expires_at):
+        ttl = math.ceil(expires_at - time.time())
+        if ttl <= 0:
+            return
+        self.get_client().set(REDIS_KEY_PREFIX + token_id, 1, ex=ttl)
+        self._local.revoke(token_id, expires_at)
+
+    def is_revoked(self, token_id):
+        if self._local.is_revoked(token_id):
+            return True
+        return bool(self.get_client().exists(REDIS_KEY_PREFIX + token_id))
+
+    def purge(self, now=None):
+        return self._local.purge(now)
+
+    def __len__(self):
+        return len(self._local)
+
+def create_store(name=REVOCATION_BACKEND):
+    if name == 'memory':
+        return MemoryStore()
+    if name == 'redis':
+        return RedisStore(REDIS_URL)
+    raise ValueError(f"Unknown revocation backend: {name}")
+
+_store = create_store()
+
+def get_store():
+    return _store
+
+def set_store(store):
+    """Swap the revocation store (e.g. a MemoryStore in tests)"""
+    global _store
+    _store = store
+
+def revoke(token_id, expires_at):
+    """Revoke a token id until `expires_at` (epoch seconds), after which the token is invalid anyway"""
+    _store.revoke(token_id, expires_at)
+    # Purging on write keeps the store bounded without a scheduled job
+    _store.purge()
+
+def is_revoked(token_id):
+    return _store.is_revoked(token_id)
+
+def purge():
+    return _store.purge()
@@ -0,0 +1,201 @@
+import functools
+import importlib
+import json
+import os
+import time
+from flask import Response
+import audit
+import auth_context
+import metrics
+import rate_limiter
+import streaming
+
+# Limits for routes that do not set their own, e.g. "200 per day,50 per hour"
+RATE_LIMITS = os.environ.get('RATE_LIMITS', "200 per day,50 per hour")
+# Per-route overrides as JSON, e.g. {"auth/login": "5 per minute"}
+ROUTE_RATE_LIMITS = json.loads(os.environ.get('ROUTE_RATE_LIMITS', '{}'))
+# Proxies in front of the function that append to X-Forwarded-For; 0 uses the socket address
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', '1'))
+
+class Route:
+    """A path served by a handler, with the metadata the middleware acts on"""
+
+    def __init__(self, path, handler, methods=('POST',), auth_required=True, rate_limit=None):
+        self.path = path
+        self.handler = resolve(handler)
+        self.methods = tuple(methods)
+        self.auth_required = auth_required
+        self.rate_limit = ROUTE_RATE_LIMITS.get(path, rate_limit or RATE_LIMITS)
+        self.limits = rate_limiter.parse_limits(self.rate_limit)
+
+def resolve(handler):
+    """Turn a "module.function" name into the function, once at import"""
+    if callable(handler):
+        return handler
+    module_name, function_name = handler.rsplit(".", 1)
+    return getattr(importlib.import_module(module_name), function_name)
+
+ROUTES = {route.path: route for route in (
+    Route("auth/register", "auth.register", auth_required=False, rate_limit="20 per hour"),
+    Route("auth/login", "auth.login", auth_required=False, rate_limit="10 per minute,100 per hour"),
+    Route("auth/protected", "auth.protected", methods=('GET', 'POST')),
+    Route("auth/logout", "auth.logout"),
+    Route("auth/refresh", "auth.refresh", rate_limit=os.environ.get('REFRESH_RATE_LIMIT', "5 per minute")),
+    Route("organizations/create", "organizations.create_organization", rate_limit="30 per minute"),
+    Route("organizations/list", "organizations.list_organizations", methods=('GET',)),
+    Route("organizations/partnerships/create", "organizations.create_partnership", rate_limit="30 per minute"),
+    Route("organizations/partnerships/list", "organizations.list_partnerships", methods=('GET',)),
+    Route("organizations/map_user", "organizations.map_user_to_organization"),
+    Route("organizations/bulk_create", "organizations.bulk_create_organizations", rate_limit="10 per minute"),
+    Route("organizations/partnerships/bulk_create", "organizations.bulk_create_partnerships", rate_limit="10 per minute"),
+    Route("organizations/map_user/bulk", "organizations.bulk_map_user_to_organizations", rate_limit="10 per minute"),
+    Route("metrics", "metrics.metrics_endpoint", methods=('GET',), auth_required=False, rate_limit="60 per minute")
+)}
+
+def error_response(status_code, code, message):
+    return Response(json.dumps({"error": {"code": code, "message": message}}), status=status_code, mimetype='application/json')
+
+def render(payload, status_code):
+    """Serialize a handler result once; streams keep a reference for the audit middleware"""
+    if isinstance(payload, Response):
+        # Already rendered, e.g. the Prometheus text of the metrics endpoint
+        payload.status_code = status_code
+        return payload
+    if isinstance(payload, streaming.JSONStream):
+        response = Response(payload.chunks(), status=status_code, mimetype='application/json')
+        response.json_stream = payload
+        return response
+    return Response(json.dumps(payload), status=status_code, mimetype='application/json')
+
+def call_handler(request, route):
+    if route is None:
+        return error_response(404, "NOT_FOUND", "Function not found")
+    payload, status_code = route.handler(request)
+    return render(payload, status_code)
+
+# Middleware take (request, route, call_next) and return a response; route is None for unknown paths
+
+def preflight(request, route, call_next):
+    """Answer CORS preflight requests without running the rest of the pipeline"""
+    if request.method != 'OPTIONS':
+        return call_next(request, route)
+    response = Response()
+    response.headers.add('Access-Control-Allow-Origin', request.headers.get('Origin', '*'))
+    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,x-access-token')
+    response.headers.add('Access-Control-Allow-Methods', 'GET,POST,OPTIONS')
+    response.headers.add('Access-Control-Allow-Credentials', 'true')
+    return response
+
+def instrument(request, route, call_next):
+    """Count requests and time them per route, and track how many are in flight"""
+    path = route.path if route is not None else 'unmatched'
+    in_flight = metrics.gauge('ocl_requests_in_flight', "Requests being handled")
+    in_flight.inc()
+    start = time.perf_counter()
+    try:
+        response = call_next(request, route)
+    finally:
+        in_flight.dec()
+    metrics.histogram('ocl_request_duration_seconds', "Time to handle a request, by route",
+                      route=path, method=request.method).observe(time.perf_counter() - start)
+    metrics.counter('ocl_requests_total', "Requests handled, by route and status",
+                    route=path, method=request.method, status=str(response.status_code)).inc()
+    return response
+
+def error_envelope(request, route, call_next):
+    """Map unhandled errors to a JSON error response"""
+    try:
+        return call_next(request, route)
+    except Exception as e:
+        return error_response(500, "INTERNAL_ERROR", str(e))
+
+def audit_log(request, route, call_next):
+    """Queue the request and its response for the audit log; they are written in batches off the request path"""
+    audit_id = audit.new_audit_id()
+    audit.record_request(audit_id, {
+        'path': request.path,
+        'method': request.method,
+        'headers': dict(request.headers),
+        'body': request.get_json() if request.is_json else None
+    })
+
+    response = call_next(request, route)
+
+    stream = getattr(response, 'json_stream', None)
+    if stream is not None:
+        # Audit a summary once the body has been sent, instead of buffering it
+        stream.on_complete = lambda stream: audit.record_response(audit_id, {
+            "status_code": response.status_code,
+            "data": stream.summary()
+        })
+    elif response.mimetype == 'application/json':
+        # Share the serialized body with the audit record
+        audit.record_response(audit_id, {"status_code": response.status_code},
+                              raw_fields={"data": response.get_data(as_text=True)})
+    else:
+        # Not JSON, e.g. the Prometheus text of the metrics endpoint; stored as a string
+        audit.record_response(audit_id, {"status_code": response.status_code, "data": response.get_data(as_text=True)})
+    return response
+
+def client_identity(request):
+    """Who a request is counted against: the user of an already verified token, else the client address"""
+    username = auth_context.cached_username(request)
+    if username:
+        return f"user:{username}"
+    # Google's front end appends the address it saw to X-Forwarded-For; earlier entries come from the client
+    # and can be forged, so count from the right past the trusted proxies
+    forwarded_for = [address.strip() for address in request.headers.get('X-Forwarded-For', '').split(',') if address.strip()]
+    if TRUSTED_PROXY_HOPS and len(forwarded_for) >= TRUSTED_PROXY_HOPS:
+        return f"ip:{forwarded_for[-TRUSTED_PROXY_HOPS]}"
+    return f"ip:{request.remote_addr}"
+
+def rate_limit(request, route, call_next):
+    """Shed load with a cheap 429 before any token, password or database work"""
+    if route is None or not route.limits:
+        return call_next(request, route)
+    allowed, retry_after = rate_limiter.check(route.path, client_identity(request), route.limits)
+    if not allowed:
+        response = error_response(429, "RATE_LIMIT_EXCEEDED", "Rate limit exceeded")
+        response.headers['Retry-After'] = str(retry_after)
+        return response
+    return call_next(request, route)
+
+def timing(request, route, call_next):
+    """Report the time spent handling the request in a Server-Timing header"""
+    start = time.perf_counter()
+    response = call_next(request, route)
+    response.headers['Server-Timing'] = f"app;dur={(time.perf_counter() - start) * 1000:.1f}"
+    return response
+
+def allow_methods(request, route, call_next):
+    """Reject methods the route does not serve"""
+    if route is not None and request.method not in route.methods:
+        return error_response(405, "METHOD_NOT_ALLOWED", f"Method {request.method} not allowed")
+    return call_next(request, route)
+
+def authenticate(request, route, call_next):
+    """Verify the token once for routes that require it; handlers read the claims from the request context"""
+    if route is None or not route.auth_required:
+        return call_next(request, route)
+    context = auth_context.attach(request)
+    if not context.is_authenticated:
+        return error_response(401, "INVALID_TOKEN", context.error)
+    return call_next(request, route)
+
+# Outermost first; instrumentation is left out entirely when metrics are disabled
+MIDDLEWARE = [preflight] + ([instrument] if metrics.METRICS_ENABLED else []) + [
+    error_envelope, rate_limit, audit_log, timing, allow_methods, authenticate
+]
+
+def build_pipeline(middleware, endpoint):
+    call = endpoint
+    for layer in reversed(middleware):
+        call = functools.partial(layer, call_next=call)
+    return call
+
+_pipeline = build_pipeline(MIDDLEWARE, call_handler)
+
+def dispatch(request):
+    """Route a request through the middleware pipeline to its handler"""
+    route = ROUTES.get(request.path.lstrip("/").split("?")[0])
+    return _pipeline(request, route)
@@ -0,0 +1,163 @@
+import os
+import threading
+import time
+import metrics
+
+project_id = os.environ.get('GCP_PROJECT')
+
+SECRET_BACKEND = os.environ.get('SECRET_BACKEND', 'secretmanager')
+SECRET_CACHE_TTL = float(os.environ.get('SECRET_CACHE_TTL', '300'))
+SECRET_REFRESH_MARGIN = float(os.environ.get('SECRET_REFRESH_MARGIN', '30'))
+
+def parse_pinned_versions(value):
+    """Parse a 'SECRET_ID=version,...' string into a dict of pinned versions"""
+    pinned = {}
+    for item in (value or '').split(','):
+        if '=' not in item:
+            continue
+        secret_id, version = item.split('=', 1)
+        if secret_id.strip() and version.strip():
+            pinned[secret_id.strip()] = version.strip()
+    return pinned
+
+class SecretManagerBackend:
+    """Fetches secrets from Google Secret Manager using a single shared client"""
+
+    def __init__(self, project_id):
+        self.project_id = project_id
+        self._client = None
+        self._lock = threading.Lock()
+
+    def get_client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from google.cloud import secretmanager
+                    self._client = secretmanager.SecretManagerServiceClient()
+        return self._client
+
+    def fetch(self, secret_id, version):
+        name = f"projects/{self.project_id}/secrets/{secret_id}/versions/{version}"
+        response = self.get_client().access_secret_version(name=name)
+        return response.payload.data.decode('UTF-8')
+
+class LocalBackend:
+    """Serves secrets from a dict, falling back to environment variables, for tests and local runs"""
+
+    def __init__(self, secrets=None):
+        self.secrets = dict(secrets or {})
+        self.fetch_count = 0
+
+    def fetch(self, secret_id, version):
+        self.fetch_count += 1
+        value = self.secrets.get(f"{secret_id}@{version}", self.secrets.get(secret_id))
+        if value is None:
+            value = os.environ.get(secret_id)
+        if value is None:
+            raise KeyError(f"Secret {secret_id} is not defined")
+        return value
+
+class SecretProvider:
+    """In-memory secret cache with a TTL and refresh-ahead before expiry"""
+
+    def __init__(self, backend, ttl=SECRET_CACHE_TTL, refresh_margin=SECRET_REFRESH_MARGIN, pinned_versions=None):
+        self.backend = backend
+        self.ttl = ttl
+        self.refresh_margin = min(refresh_margin, ttl)
+        self.pinned_versions = dict(pinned_versions or {})
+        self._cache = {}
+        self.hits = 0
+        self.misses = 0
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def pin_version(self, secret_id, version):
+        """Pin a secret to a specific version instead of 'latest'"""
+        with self._lock:
+            self.pinned_versions[secret_id] = str(version)
+
+    def get(self, secret_id, version=None):
+        version = str(version or self.pinned_versions.get(secret_id, 'latest'))
+        key = (secret_id, version)
+        now = time.monotonic()
+
+        entry = self._cache.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if now < expires_at:
+                if expires_at - now <= self.refresh_margin:
+                    self._refresh_in_background(key)
+                self.hits += 1
+                return value
+
+        self.misses += 1
+        return self._load(key)
+
+    def invalidate(self, secret_id=None):
+        """Drop one secret (all versions) or the whole cache"""
+        with self._lock:
+            if secret_id is None:
+                self._cache.clear()
+            else:
+                for key in [key for key in self._cache if key[0] == secret_id]:
+                    del self._cache[key]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._cache),
+            'hit_ratio': self.hits / lookups if lookups else 0.0
+        }
+
+    def _load(self, key):
+        with metrics.timer('secret_manager', 'fetch'):
+            value = self.backend.fetch(*key)
+        with self._lock:
+            self._cache[key] = (value, time.monotonic() + self.ttl)
+        return value
+
+    def _refresh_in_background(self, key):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self._load(key)
+            except Exception as e:
+                # Keep serving the cached value until it expires
+                print("Secret refresh error:", str(e))
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+def create_backend(name=SECRET_BACKEND):
+    if name == 'local':
+        return LocalBackend()
+    if name == 'secretmanager':
+        return SecretManagerBackend(project_id)
+    raise ValueError(f"Unknown secret backend: {name}")
+
+_provider = SecretProvider(
+    create_backend(),
+    pinned_versions=parse_pinned_versions(os.environ.get('SECRET_VERSIONS'))
+)
+
+def get_provider():
+    return _provider
+
+def set_backend(backend):
+    """Swap the secret backend (e.g. a LocalBackend in tests) and clear the cache"""
+    _provider.backend = backend
+    _provider.invalidate()
+
+def get_secret(secret_id, version=None):
+    return _provider.get(secret_id, version)
+
+def invalidate(secret_id=None):
+    _provider.invalidate(secret_id)
@@ -0,0 +1,58 @@
+import json
+
+# Serialized items are buffered into chunks of roughly this many characters before being yielded
+STREAM_CHUNK_SIZE = 64 * 1024
+
+class JSONStream:
+    """A JSON object whose `key` array is serialized item by item as the body is sent
+
+    Handlers return it in place of a dict; main.handle_request sends it as a
+    generator-backed response, so only one chunk of items is held in memory.
+    """
+
+    def __init__(self, key, items, fields=None, chunk_size=STREAM_CHUNK_SIZE):
+        self.key = key
+        self.items = items
+        self.fields = fields or {}
+        self.chunk_size = chunk_size
+        self.count = 0
+        self.error = None
+        self.on_complete = None
+
+    def chunks(self):
+        buffer = ['{' + json.dumps(self.key) + ': [']
+        size = 0
+        try:
+            for item in self.items:
+                serialized = json.dumps(item)
+                buffer.append(',' + serialized if self.count else serialized)
+                self.count += 1
+                size += len(serialized)
+                if size >= self.chunk_size:
+                    yield ''.join(buffer)
+                    buffer = []
+                    size = 0
+        except Exception as e:
+            # Headers are already sent, so the body is left truncated and the error is only logged
+            self.error = str(e)
+            print("Streaming error:", str(e))
+            yield ''.join(buffer)
+        else:
+            closing = ']'
+            for name, value in self.fields.items():
+                closing += f", {json.dumps(name)}: {json.dumps(value)}"
+            buffer.append(closing + '}')
+            yield ''.join(buffer)
+        finally:
+            if self.on_complete:
+                self.on_complete(self)
+
+    def summary(self):
+        """Audit-friendly description of what was streamed"""
+        summary = {'streamed': True, 'key': self.key, 'count': self.count}
+        if self.error:
+            summary['error'] = self.error
+        return summary
+
+def is_stream_request(request):
+    return getattr(request, 'args', {}).get('stream', '').lower() in ('1', 'true', 'yes')
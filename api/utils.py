@@ -1,19 +1,22 @@
 import re
 import uuid
-import jwt
-from flask import request
-import auth
-from google.cloud import secretmanager
+import base64
+import json
+import auth_context
 import os
+import metrics
+import secret_provider
 from database import get_user_credentials as db_get_user_credentials
 
 project_id = os.environ.get('GCP_PROJECT')
 
-def get_secret(secret_id):
-    client = secretmanager.SecretManagerServiceClient()
-    name = f"projects/{project_id}/secrets/{secret_id}/versions/latest"
-    response = client.access_secret_version(name=name)
-    return response.payload.data.decode('UTF-8')
+DEFAULT_PAGE_SIZE = int(os.environ.get('DEFAULT_PAGE_SIZE', '100'))
+MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', '1000'))
+
+@metrics.timed('secrets', 'get')
+def get_secret(secret_id, version=None):
+    """Get a secret through the shared, cached secret provider"""
+    return secret_provider.get_secret(secret_id, version)
 
 def validate_request_data(request):
     """Validate request data format"""
@@ -88,44 +91,57 @@ def validate_password(password):
     
     return True, None
 
-def validate_token(token, blacklisted_tokens):
-    """Validate JWT token format"""
+def validate_token(token, blacklisted_tokens=()):
+    """Validate JWT token format; revoked tokens are rejected by auth_context.verify_token"""
     if not token or not isinstance(token, str):
         return False, "Token is required and must be a string"
     
     if token in blacklisted_tokens:
         return False, "Token has been blacklisted"
     
-    try:
-        jwt.decode(token, get_secret('SECRET_KEY'), algorithms=["HS256"])
-        return True, None
-    except jwt.ExpiredSignatureError:
-        return False, "Token has expired"
-    except jwt.InvalidTokenError:
-        return False, "Invalid token format"
+    _, error = auth_context.verify_token(token)
+    if error:
+        return False, error
+    return True, None
 
-def get_user_from_token(request):
-    """Extract username from authorized token"""
-    if not auth.authorized(request):
+def encode_cursor(values):
+    """Encode the keyset position of the last row of a page as an opaque cursor"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor; returns None if it is malformed"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, UnicodeError):
         return None
-    
-    if hasattr(request, 'headers'):
-        token = request.headers.get('x-access-token')
-    else:
-        headers = request.get('headers', {})
-        token = headers.get('x-access-token')
-    
-    if not token or not isinstance(token, str):
+    if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
         return None
-    
+    return values
+
+def validate_page_params(request):
+    """Validate the limit and cursor query parameters of a list request"""
+    args = getattr(request, 'args', {})
+
+    limit = args.get('limit', DEFAULT_PAGE_SIZE)
     try:
-        data = auth.jwt.decode(token, get_secret('SECRET_KEY'), algorithms=["HS256"])
-        username = data.get('username')
-        if not username or not isinstance(username, str):
-            return None
-        return username
-    except:
-        return None
+        limit = int(limit)
+    except (TypeError, ValueError):
+        return None, "Limit must be an integer"
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        return None, f"Limit must be between 1 and {MAX_PAGE_SIZE}"
+
+    cursor = args.get('cursor')
+    after = None
+    if cursor:
+        after = decode_cursor(cursor)
+        if after is None:
+            return None, "Invalid cursor"
+
+    return {'limit': limit, 'after': after}, None
+
+def get_user_from_token(request):
+    """Extract username from the request's verified auth context"""
+    return auth_context.get_context(request).username
     
 def get_user_credentials(username):
     """Get user credentials from BigQuery"""
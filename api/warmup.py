@@ -0,0 +1,51 @@
+import os
+import threading
+import time
+import audit
+import clients
+import concurrency
+import database
+import secret_provider
+
+# Enable together with min-instances so idle instances are ready before their first request
+WARMUP_ON_START = os.environ.get('WARMUP_ON_START', 'false').lower() in ('1', 'true', 'yes')
+WARMUP_SECRETS = [secret_id for secret_id in os.environ.get('WARMUP_SECRETS', 'SECRET_KEY').split(',') if secret_id]
+
+def prefetch_secrets():
+    for secret_id in WARMUP_SECRETS:
+        secret_provider.get_secret(secret_id)
+
+def warmup_steps():
+    """Work normally done lazily by the first requests, in the order it is warmed up"""
+    steps = {
+        'jwt': lambda: __import__('jwt'),
+        'secrets': prefetch_secrets,
+        'database': database.get_backend,
+        'executor': concurrency.get_executor
+    }
+    if database.DATABASE_BACKEND == 'bigquery':
+        steps['bigquery'] = clients.get_bigquery_client
+    if audit.AUDIT_SINK == 'gcs':
+        steps['storage'] = clients.get_storage_client
+    return steps
+
+def warm_up():
+    """Run every warm-up step; returns {step: seconds taken}, failures are logged and skipped"""
+    timings = {}
+    for name, step in warmup_steps().items():
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            print(f"Warm-up step {name} failed:", str(e))
+            continue
+        timings[name] = time.perf_counter() - start
+    return timings
+
+def start():
+    """Warm up in the background when WARMUP_ON_START is set, without delaying the first request"""
+    if not WARMUP_ON_START:
+        return None
+    thread = threading.Thread(target=warm_up, name='warmup', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,120 @@
+"""Compare the agent processing utterances one by one on fresh connections with the concurrent, pooled runner.
+
+Runs offline against local stand-ins: a fake LLM client and a local HTTP
+server in place of the API, each with injected latency:
+
+    python benchmarks/bench_agent_runner.py --queries 40 --llm-latency 300 --api-latency 50
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'api'))
+os.environ['LLM_CLIENT'] = 'fake'
+os.environ['LLM_CACHE'] = 'false'
+os.chdir(ROOT)  # the agent reads intents.json from the working directory
+
+import requests
+import agent
+import llm_cache
+
+UTTERANCES = [
+    "list all the partnerships i have access to",
+    "create a new organization called OpenAI",
+    "what are the partnerships?",
+    "map juan@hello.com to OpenAI",
+    "could you spin up an entity named Hooli",
+    "show me my orgs"
+]
+
+class FakeAPI(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, as the real API
+    latency = 0.0
+    connections = set()
+    lock = threading.Lock()
+
+    def handle_one_request(self):
+        with self.lock:
+            self.connections.add(self.client_address)
+        super().handle_one_request()
+
+    def reply(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        time.sleep(self.latency)
+        body = json.dumps({"message": "ok"}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = reply
+    do_POST = reply
+
+    def log_message(self, *args):
+        pass
+
+def respond(messages):
+    system = messages[0]['content']
+    if 'predefined intents and extracts' in system:
+        return json.dumps({"intent": "create_organization", "parameters": {"organization_name": "Hooli"}, "clarification": None})
+    if 'extracts parameters' in system:
+        names = system.split('following parameters: ')[1].split('.')[0].split(', ')
+        return json.dumps({name: "value" for name in names})
+    return "Formatted response"
+
+class UnpooledSession:
+    """A new connection per call, as bare requests.get/requests.post"""
+
+    def get(self, url, **kwargs):
+        return requests.get(url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return requests.post(url, **kwargs)
+
+def run(label, queries, session, workers):
+    FakeAPI.connections.clear()
+    agent.set_session(session)
+    start = time.perf_counter()
+    if workers == 1:
+        results = [agent.process_query(query) for query in queries]
+    else:
+        results = agent.run_queries(queries, workers=workers)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<22} {elapsed * 1000:9.1f}ms  {len(queries) / elapsed:7.1f} utterances/s  "
+          f"{len(FakeAPI.connections)} API connections")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--queries', type=int, default=40)
+    parser.add_argument('--workers', type=int, default=agent.AGENT_WORKERS)
+    parser.add_argument('--llm-latency', type=float, default=300, help="milliseconds per LLM call")
+    parser.add_argument('--api-latency', type=float, default=50, help="milliseconds per API call")
+    args = parser.parse_args()
+
+    FakeAPI.latency = args.api_latency / 1000
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeAPI)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    agent.set_api_base_url(f"http://127.0.0.1:{server.server_port}")
+
+    fake = llm_cache.FakeClient(respond, latency=args.llm_latency / 1000)
+    agent.set_client(fake)
+
+    queries = [UTTERANCES[i % len(UTTERANCES)] for i in range(args.queries)]
+    sequential = run('sequential, unpooled', queries, UnpooledSession(), 1)
+    calls = fake.calls
+    concurrent = run(f'concurrent x{args.workers}, pooled', queries, None, args.workers)
+    assert sequential == concurrent, "results differ or are out of order"
+    print(f"{calls} LLM calls per run; results identical and in input order")
+    server.shutdown()
+
+if __name__ == '__main__':
+    main()
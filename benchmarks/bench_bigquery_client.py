@@ -0,0 +1,174 @@
+"""Compare per-query overhead of a fresh BigQuery client per call against the shared pooled client.
+
+Live mode runs `SELECT 1` against BigQuery and needs application default credentials:
+
+    python benchmarks/bench_bigquery_client.py --iterations 20
+
+Stub mode runs the same query against a local HTTPS server that answers the
+BigQuery REST calls, so each arm pays for its HTTP session, TCP connection and
+TLS handshake as in production, without network access or credentials:
+
+    python benchmarks/bench_bigquery_client.py --stub --iterations 200
+
+Both arms use anonymous credentials in stub mode, so credential discovery
+(a metadata server or key file lookup per fresh client) is only measured live.
+"""
+import argparse
+import datetime
+import json
+import os
+import re
+import ssl
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api'))
+
+from google.cloud import bigquery
+import clients
+
+JOB_PATH = re.compile(r'/bigquery/v2/projects/([^/]+)/(?:jobs|queries)(?:/([^/?]+))?')
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers jobs.insert, jobs.get and jobs.getQueryResults with a finished one-row job"""
+    protocol_version = 'HTTP/1.1'  # keep-alive, as the BigQuery front end
+    disable_nagle_algorithm = True
+
+    def job(self, project, job_id):
+        return {
+            'jobReference': {'projectId': project, 'jobId': job_id, 'location': 'US'},
+            'configuration': {'query': {'query': 'SELECT 1'}},
+            'status': {'state': 'DONE'}
+        }
+
+    def send_json(self, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        project, _ = JOB_PATH.match(self.path).groups()
+        self.server.connections_seen.add(self.client_address)
+        self.send_json(self.job(project, f"stub_{time.perf_counter_ns()}"))
+
+    def do_GET(self):
+        project, job_id = JOB_PATH.match(self.path).groups()
+        self.server.connections_seen.add(self.client_address)
+        if '/queries/' in self.path:
+            self.send_json({
+                'jobComplete': True,
+                'jobReference': {'projectId': project, 'jobId': job_id, 'location': 'US'},
+                'schema': {'fields': [{'name': 'f0_', 'type': 'INTEGER'}]},
+                'rows': [{'f': [{'v': '1'}]}],
+                'totalRows': '1'
+            })
+        else:
+            self.send_json(self.job(project, job_id))
+
+    def log_message(self, format, *args):
+        pass
+
+def self_signed_certificate(directory):
+    """Write a certificate and key for 127.0.0.1; returns (certificate path, key path)"""
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+    import ipaddress
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, '127.0.0.1')])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name).issuer_name(name).public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=1)).not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address('127.0.0.1'))]), critical=False)
+        .sign(key, hashes.SHA256())
+    )
+    certificate_path = os.path.join(directory, 'stub.crt')
+    key_path = os.path.join(directory, 'stub.key')
+    with open(certificate_path, 'wb') as f:
+        f.write(certificate.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, 'wb') as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+    return certificate_path, key_path
+
+def start_stub(directory):
+    """Serve the stub over TLS on a free local port; returns (server, endpoint)"""
+    certificate_path, key_path = self_signed_certificate(directory)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.daemon_threads = True
+    server.connections_seen = set()
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(certificate_path, key_path)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    # requests sessions, including the client's AuthorizedSession, trust the stub through this
+    os.environ['REQUESTS_CA_BUNDLE'] = certificate_path
+    return server, f"https://127.0.0.1:{server.server_address[1]}"
+
+def stub_options(endpoint):
+    from google.auth.credentials import AnonymousCredentials
+    return {'project': 'benchmark', 'credentials': AnonymousCredentials(), 'client_options': {'api_endpoint': endpoint}}
+
+def fresh_client(endpoint):
+    # What database.py did before the shared client: a new client, HTTP session and connection per query
+    if endpoint:
+        return bigquery.Client(**stub_options(endpoint))
+    return bigquery.Client()
+
+def shared_client(endpoint):
+    return clients.get_bigquery_client()
+
+def run(get_client, iterations, endpoint):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        client = get_client(endpoint)
+        list(client.query("SELECT 1").result())
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def report(label, timings, connections=None):
+    timings = sorted(timings)
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    line = f"{label:<8} mean={statistics.mean(timings):9.3f}ms  p50={statistics.median(timings):9.3f}ms  p95={p95:9.3f}ms"
+    if connections is not None:
+        line += f"  connections={connections}"
+    print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--stub', action='store_true', help="query a local HTTPS stub of the BigQuery API instead of BigQuery")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        server, endpoint = start_stub(directory) if args.stub else (None, None)
+        if args.stub:
+            options = stub_options(endpoint)
+            clients.set_bigquery_client(bigquery.Client(
+                **options, _http=clients.create_pooled_session(options['credentials'], clients.BIGQUERY_POOL_SIZE)
+            ))
+
+        # Warm up imports and the shared client's connection pool
+        run(shared_client, 1, endpoint)
+
+        for label, get_client in (('before', fresh_client), ('after', shared_client)):
+            if server:
+                server.connections_seen.clear()
+            timings = run(get_client, args.iterations, endpoint)
+            report(label, timings, len(server.connections_seen) if server else None)
+
+if __name__ == '__main__':
+    main()
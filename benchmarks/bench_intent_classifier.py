@@ -0,0 +1,106 @@
+"""Measure how many agent queries the local intent classifier resolves, how accurately, and how fast.
+
+Runs offline over a labeled query set (intent null means the query should be
+left to the LLM). The set is held out: queries that are also examples in
+intents.json are refused, as they would inflate the results.
+
+    python benchmarks/bench_intent_classifier.py
+    python benchmarks/bench_intent_classifier.py --sweep --show-errors
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'api'))
+
+import intent_classifier
+
+def load_queries(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def canonical(text):
+    return ' '.join(re.sub(r'[^\w@.\s]', '', text.lower()).split())
+
+def overlapping_queries(intents, queries):
+    """Queries that appear, ignoring case and punctuation, among the classifier's examples"""
+    examples = {canonical(example) for intent in intents.values() for example in intent.get('examples', ())}
+    return [query['query'] for query in queries if canonical(query['query']) in examples]
+
+def evaluate(classifier, queries, repeat):
+    results = []
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            predicted, confidence = classifier.classify(query['query'])
+        timings.append((time.perf_counter() - start) / repeat * 1e6)
+        results.append((query, predicted, confidence))
+    return results, timings
+
+def summarize(results):
+    in_scope = [(query, predicted) for query, predicted, _ in results if query['intent']]
+    resolved = [(query, predicted) for query, predicted in in_scope if predicted]
+    correct = sum(1 for query, predicted in resolved if predicted == query['intent'])
+    false_accepts = sum(1 for query, predicted, _ in results if not query['intent'] and predicted)
+    out_of_scope = len(results) - len(in_scope)
+    return {
+        'resolved': len(resolved) / len(in_scope) if in_scope else 0,
+        'precision': correct / len(resolved) if resolved else 1,
+        'wrong': len(resolved) - correct,
+        'false_accepts': false_accepts,
+        'out_of_scope': out_of_scope,
+        'llm_calls_saved': sum(1 for _, predicted, _ in results if predicted) / len(results)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--intents', default=os.path.join(ROOT, 'intents.json'))
+    parser.add_argument('--queries', default=os.path.join(ROOT, 'benchmarks', 'intent_queries.jsonl'))
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--sweep', action='store_true', help="also report results across confidence thresholds")
+    parser.add_argument('--show-errors', action='store_true')
+    args = parser.parse_args()
+
+    with open(args.intents) as f:
+        intents = json.load(f)
+    queries = load_queries(args.queries)
+    overlapping = overlapping_queries(intents, queries)
+    if overlapping:
+        sys.exit(f"{len(overlapping)} queries are also intent examples: {overlapping}")
+
+    start = time.perf_counter()
+    classifier = intent_classifier.IntentClassifier(intents)
+    print(f"built from {sum(len(intent.get('examples', ())) for intent in intents.values())} examples "
+          f"in {(time.perf_counter() - start) * 1000:.2f}ms")
+
+    results, timings = evaluate(classifier, queries, args.repeat)
+    summary = summarize(results)
+    print(f"threshold={classifier.threshold} margin={classifier.min_margin}  {len(queries)} queries")
+    print(f"resolved locally  {summary['resolved']:.0%} of in-scope queries, precision {summary['precision']:.0%} "
+          f"({summary['wrong']} wrong)")
+    print(f"false accepts     {summary['false_accepts']} of {summary['out_of_scope']} out-of-scope queries")
+    print(f"llm calls saved   {summary['llm_calls_saved']:.0%}")
+    timings.sort()
+    print(f"latency           p50={statistics.median(timings):.1f}us  "
+          f"p99={timings[int(len(timings) * 0.99)]:.1f}us  max={timings[-1]:.1f}us")
+
+    if args.show_errors:
+        for query, predicted, confidence in results:
+            if predicted != query['intent']:
+                print(f"  {confidence:.2f}  expected={query['intent']}  got={predicted}  {query['query']!r}")
+
+    if args.sweep:
+        print("\nthreshold  resolved  precision  false accepts")
+        for threshold in (0.2, 0.3, 0.35, 0.4, 0.45, 0.5, 0.6, 0.7):
+            swept = intent_classifier.IntentClassifier(intents, threshold=threshold)
+            summary = summarize(evaluate(swept, queries, 1)[0])
+            print(f"{threshold:9.2f}  {summary['resolved']:8.0%}  {summary['precision']:9.0%}  {summary['false_accepts']:13}")
+
+if __name__ == '__main__':
+    main()
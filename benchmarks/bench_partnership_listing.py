@@ -0,0 +1,230 @@
+"""Compare the OR-join/DISTINCT partnership query with the union-based listing engine on synthetic data.
+
+Latency is measured on an in-process SQLite database seeded with synthetic
+organizations, memberships and partnerships:
+
+    python benchmarks/bench_partnership_listing.py --orgs 10000 --partnerships 1000000
+
+With --bigquery, the same synthetic rows are also loaded into a scratch dataset
+of GCP_PROJECT (replaced on every run) and both listings are dry-run there to
+report the bytes each would scan for the same user. The union side dry-runs
+every query BigQueryBackend issues for the listing, as recorded from a run of
+the listing engine against the seeded rows:
+
+    python benchmarks/bench_partnership_listing.py --bigquery --scratch-dataset bench_partnership_listing
+"""
+import argparse
+import datetime
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api'))
+
+import database
+import partnership_listing
+from database_sqlite import SQLiteBackend
+from gcp_fakes import FakeBigQueryClient
+
+LEGACY_SQLITE_QUERY = """
+    SELECT DISTINCT
+        p.partnership_id,
+        d.organization_id AS demand_org_id,
+        d.organization_name AS demand_org_name,
+        d.created_by AS demand_org_created_by,
+        d.created_at AS demand_org_created_at,
+        s.organization_id AS supply_org_id,
+        s.organization_name AS supply_org_name,
+        s.created_by AS supply_org_created_by,
+        s.created_at AS supply_org_created_at
+    FROM partnerships p
+    JOIN organizations d ON p.demand_org_id = d.organization_id
+    JOIN organizations s ON p.supply_org_id = s.organization_id
+    JOIN user_organization uo
+    ON uo.organization_id = d.organization_id OR uo.organization_id = s.organization_id
+    WHERE uo.username = :username
+"""
+
+LEGACY_BIGQUERY_QUERY = """
+    SELECT DISTINCT
+        p.partnership_id,
+        d.organization_id as demand_org_id,
+        d.organization_name as demand_org_name,
+        d.created_by as demand_org_created_by,
+        d.created_at as demand_org_created_at,
+        s.organization_id as supply_org_id,
+        s.organization_name as supply_org_name,
+        s.created_by as supply_org_created_by,
+        s.created_at as supply_org_created_at
+    FROM `{project}.organizations.partnerships` p
+    JOIN `{project}.organizations.organizations` d ON p.demand_org_id = d.organization_id
+    JOIN `{project}.organizations.organizations` s ON p.supply_org_id = s.organization_id
+    JOIN `{project}.users.user_organization` uo
+    ON uo.organization_id = d.organization_id OR uo.organization_id = s.organization_id
+    WHERE uo.username = @username
+"""
+
+# Column types of the scratch tables, as in the production datasets
+SCRATCH_SCHEMAS = {
+    'organizations': (('organization_id', 'STRING'), ('organization_name', 'STRING'),
+                      ('created_by', 'STRING'), ('created_at', 'TIMESTAMP')),
+    'user_organization': (('username', 'STRING'), ('organization_id', 'STRING'), ('status', 'STRING')),
+    'partnerships': (('partnership_id', 'STRING'), ('demand_org_id', 'STRING'), ('supply_org_id', 'STRING'))
+}
+
+class ScratchDataset:
+    """Tables of the production schema in one dataset of GCP_PROJECT, for dry runs over the synthetic rows"""
+
+    def __init__(self, project, dataset):
+        from google.cloud import bigquery
+        import clients
+        self.bigquery = bigquery
+        self.client = clients.get_bigquery_client()
+        self.project = project
+        self.dataset = dataset
+
+    def create(self):
+        self.client.create_dataset(f"{self.project}.{self.dataset}", exists_ok=True)
+        for table, columns in SCRATCH_SCHEMAS.items():
+            table_id = f"{self.project}.{self.dataset}.{table}"
+            self.client.delete_table(table_id, not_found_ok=True)
+            schema = [self.bigquery.SchemaField(name, field_type) for name, field_type in columns]
+            self.client.create_table(self.bigquery.Table(table_id, schema=schema))
+
+    def insert_rows(self, table_id, rows):
+        # Load jobs rather than streaming inserts, so the rows are in storage and counted by dry runs
+        table = table_id.split('.')[-1]
+        job_config = self.bigquery.LoadJobConfig(write_disposition='WRITE_APPEND')
+        self.client.load_table_from_json(rows, f"{self.project}.{self.dataset}.{table}", job_config=job_config).result()
+
+    def rewrite(self, query):
+        """Point the production table references of a query at the scratch tables"""
+        for dataset in ('organizations', 'users'):
+            query = query.replace(f"`{self.project}.{dataset}.", f"`{self.project}.{self.dataset}.")
+        return query
+
+    def dry_run_bytes(self, query, query_parameters):
+        job_config = self.bigquery.QueryJobConfig(dry_run=True, use_query_cache=False, query_parameters=query_parameters)
+        return self.client.query(self.rewrite(query), job_config=job_config).total_bytes_processed
+
+class RecordingBigQueryClient(FakeBigQueryClient):
+    """Answers BigQueryBackend from the seeded SQLite rows and keeps every query it was sent"""
+
+    def __init__(self, store):
+        super().__init__(store=store)
+        self.sent = []
+
+    def query(self, query, job_config=None):
+        self.sent.append((query, list(getattr(job_config, 'query_parameters', None) or ())))
+        return super().query(query, job_config)
+
+def seed(backends, orgs, partnerships, users, memberships_per_user, rng):
+    def insert_rows(table_id, rows):
+        for backend in backends:
+            backend.insert_rows(table_id, rows)
+
+    org_ids = [f"{i:06x}" for i in range(orgs)]
+    created_at = datetime.datetime(2024, 1, 1).isoformat()
+    insert_rows('organizations.organizations', [
+        {'organization_id': org_id, 'organization_name': f"Org {org_id}", 'created_by': 'seed', 'created_at': created_at}
+        for org_id in org_ids
+    ])
+
+    usernames = [f"user{i}@example.com" for i in range(users)]
+    insert_rows('users.user_organization', [
+        {'username': username, 'organization_id': org_id, 'status': 'active'}
+        for username in usernames
+        for org_id in rng.sample(org_ids, memberships_per_user)
+    ])
+
+    batch = []
+    for i in range(partnerships):
+        demand, supply = rng.sample(org_ids, 2)
+        batch.append({'partnership_id': f"p{i:07x}", 'demand_org_id': demand, 'supply_org_id': supply})
+        if len(batch) == 50000:
+            insert_rows('organizations.partnerships', batch)
+            batch = []
+    if batch:
+        insert_rows('organizations.partnerships', batch)
+    return usernames
+
+def time_call(fn, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        database.set_backend(database.get_backend())  # start every run with cold caches
+        start = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings, result
+
+def bigquery_bytes(scratch, backend, username):
+    """Bytes the OR-join and each query of the production union listing would scan for the user"""
+    from database_bigquery import BigQueryBackend, query_parameter
+    import clients
+
+    legacy_bytes = scratch.dry_run_bytes(LEGACY_BIGQUERY_QUERY.format(project=scratch.project),
+                                         [query_parameter('username', username)])
+
+    # Run the listing engine on the BigQuery backend with cold caches, answered from the seeded rows
+    recorder = RecordingBigQueryClient(backend)
+    clients.set_bigquery_client(recorder)
+    database.set_backend(BigQueryBackend(scratch.project))
+    try:
+        partnership_listing.list_partnerships_for_user(username)
+    finally:
+        clients.set_bigquery_client(scratch.client)
+        database.set_backend(backend)
+    union_bytes = [(query, scratch.dry_run_bytes(query, parameters)) for query, parameters in recorder.sent]
+    return legacy_bytes, union_bytes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--orgs', type=int, default=10000)
+    parser.add_argument('--partnerships', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--memberships-per-user', type=int, default=3)
+    parser.add_argument('--sample-users', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--bigquery', action='store_true', help="also load the rows into BigQuery and dry-run both listings")
+    parser.add_argument('--scratch-dataset', default='bench_partnership_listing',
+                        help="dataset of GCP_PROJECT replaced with the synthetic rows for --bigquery")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    backend = SQLiteBackend(':memory:')
+    backends = [backend]
+    scratch = None
+    if args.bigquery:
+        scratch = ScratchDataset(os.environ['GCP_PROJECT'], args.scratch_dataset)
+        scratch.create()
+        backends.append(scratch)
+    start = time.perf_counter()
+    usernames = seed(backends, args.orgs, args.partnerships, args.users, args.memberships_per_user, rng)
+    print(f"seeded {args.orgs} orgs, {args.partnerships} partnerships, {args.users} users in {time.perf_counter() - start:.1f}s")
+    database.set_backend(backend)
+
+    legacy_timings, engine_timings = [], []
+    for username in rng.sample(usernames, args.sample_users):
+        timings, legacy_rows = time_call(lambda: backend.execute_query(LEGACY_SQLITE_QUERY, {'username': username}), args.repeat)
+        legacy_timings.extend(timings)
+        timings, partnerships = time_call(lambda: partnership_listing.list_partnerships_for_user(username), args.repeat)
+        engine_timings.extend(timings)
+        assert {row.partnership_id for row in legacy_rows} == {p['partnership_id'] for p in partnerships}
+        print(f"{username}: {len(partnerships)} partnerships")
+
+    for label, timings in (('or-join', legacy_timings), ('union', engine_timings)):
+        print(f"{label:<8} p50={statistics.median(timings):9.2f}ms  max={max(timings):9.2f}ms")
+
+    if scratch:
+        legacy_bytes, union_bytes = bigquery_bytes(scratch, backend, usernames[0])
+        print(f"or-join  bytes={legacy_bytes}")
+        print(f"union    bytes={sum(scanned for _, scanned in union_bytes)} over {len(union_bytes)} queries")
+        for query, scanned in union_bytes:
+            print(f"  {scanned:>14}  {' '.join(query.split())[:100]}")
+
+if __name__ == '__main__':
+    main()
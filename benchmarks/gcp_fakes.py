@@ -0,0 +1,115 @@
+"""In-process stand-ins for the BigQuery, Cloud Storage and Secret Manager clients, with injected latency.
+
+The fake BigQuery client runs the queries of database_bigquery on SQLite, so
+benchmarks exercise the same backend code as production without network access.
+"""
+import json
+import re
+import threading
+import time
+import types
+from database_backend import table_name
+from database_sqlite import Row, SQLiteBackend, TABLES
+
+TABLE_PATTERN = re.compile(r'`([^`]+)`')
+UNNEST_PATTERN = re.compile(r'IN UNNEST\(@(\w+)\)')
+STARTS_WITH_PATTERN = re.compile(r'STARTS_WITH\(([\w.]+), @(\w+)\)')
+PARAMETER_PATTERN = re.compile(r'@(\w+)')
+
+def sleep(latency):
+    if latency:
+        time.sleep(latency)
+
+def to_sqlite(query):
+    """Rewrite the BigQuery dialect used by database_bigquery into SQLite"""
+    query = TABLE_PATTERN.sub(lambda match: TABLES[table_name(match.group(1))][0], query)
+    query = UNNEST_PATTERN.sub(r'IN (SELECT value FROM json_each(:\1))', query)
+    query = STARTS_WITH_PATTERN.sub(r'substr(\1, 1, length(:\2)) = :\2', query)
+    return PARAMETER_PATTERN.sub(r':\1', query)
+
+def parameter_value(parameter):
+    if hasattr(parameter, 'values'):
+        return json.dumps([sqlite_value(value) for value in parameter.values])
+    return sqlite_value(parameter.value)
+
+def sqlite_value(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+class Store(SQLiteBackend):
+    """SQLite tables behind the fake client; queries are profiled by the BigQuery backend, not again here"""
+
+    def execute_query(self, query, params=None, name=None):
+        with self._lock:
+            cursor = self._connection.execute(query, params or {})
+            columns = [column[0] for column in cursor.description or ()]
+            return [Row(columns, values) for values in cursor.fetchall()]
+
+class FakeQueryJob:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def result(self):
+        return self.rows
+
+class FakeBigQueryClient:
+    """`query` and `insert_rows_json` over an in-memory SQLite database; `latency` seconds per call"""
+
+    def __init__(self, latency=0.0, store=None):
+        self.latency = latency
+        self.store = store or Store(':memory:')
+        self.queries = 0
+        self.inserts = 0
+        self._lock = threading.Lock()
+
+    def query(self, query, job_config=None):
+        params = {}
+        for parameter in getattr(job_config, 'query_parameters', None) or ():
+            params[parameter.name] = parameter_value(parameter)
+        with self._lock:
+            self.queries += 1
+        sleep(self.latency)
+        return FakeQueryJob(self.store.execute_query(to_sqlite(query), params))
+
+    def insert_rows_json(self, table_id, rows):
+        with self._lock:
+            self.inserts += 1
+        sleep(self.latency)
+        return self.store.insert_rows(table_id, rows)
+
+class FakeBlob:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self.content_encoding = None
+
+    def upload_from_string(self, data, content_type=None):
+        sleep(self.client.latency)
+        with self.client._lock:
+            self.client.uploads += 1
+            self.client.bytes_uploaded += len(data)
+
+class FakeStorageClient:
+    """Accepts uploads without keeping them; counts uploads and bytes"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.uploads = 0
+        self.bytes_uploaded = 0
+        self._lock = threading.Lock()
+
+    def bucket(self, name):
+        return types.SimpleNamespace(blob=lambda blob_name: FakeBlob(self, blob_name))
+
+class FakeSecretManagerClient:
+    """Serves `secrets` by secret id, whatever the version"""
+
+    def __init__(self, secrets, latency=0.0):
+        self.secrets = dict(secrets)
+        self.latency = latency
+        self.calls = 0
+
+    def access_secret_version(self, name):
+        self.calls += 1
+        sleep(self.latency)
+        secret_id = name.split('/secrets/')[1].split('/')[0]
+        return types.SimpleNamespace(payload=types.SimpleNamespace(data=self.secrets[secret_id].encode('UTF-8')))
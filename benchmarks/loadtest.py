@@ -0,0 +1,304 @@
+"""Load-test the API offline: latency percentiles and throughput per endpoint at several data scales.
+
+Requests go through the Flask app to main.handle_request, with in-process fakes
+for the BigQuery, Cloud Storage and Secret Manager clients (see gcp_fakes.py)
+and the given injected latency per call:
+
+    python benchmarks/loadtest.py --scales small,medium --requests 200 --concurrency 8 \\
+        --bigquery-latency 20 --gcs-latency 30 --secret-latency 50 --output loadtest.json
+
+Results, with the query profiler aggregates of each scale, are written as JSON; pass an earlier run
+with --compare to print the change per endpoint.
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'api'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Production configuration, with every GCP client replaced by a fake below
+os.environ.setdefault('GCP_PROJECT', 'loadtest')
+os.environ['DATABASE_BACKEND'] = 'bigquery'
+os.environ['SECRET_BACKEND'] = 'secretmanager'
+os.environ['AUDIT_SINK'] = 'gcs'
+os.environ['WARMUP_ON_START'] = 'false'
+warnings.filterwarnings('ignore')
+
+import jwt
+from werkzeug.security import generate_password_hash
+import audit
+import clients
+import database
+import main as api_main
+import partnership_view
+import query_profiler
+import router
+import secret_provider
+from database_bigquery import BigQueryBackend
+import gcp_fakes
+
+SECRET_KEY = 'loadtest-secret-key-' + 'x' * 32
+PASSWORD = 'Passw0rd!'
+
+SCALES = {
+    'small': {'users': 20, 'organizations': 100, 'partnerships': 500},
+    'medium': {'users': 200, 'organizations': 2000, 'partnerships': 20000},
+    'large': {'users': 1000, 'organizations': 20000, 'partnerships': 200000}
+}
+
+def seed(client, scale, rng):
+    """Insert synthetic users, organizations, memberships and partnerships straight into the fake store"""
+    project = os.environ['GCP_PROJECT']
+    sizes = SCALES[scale]
+    # pbkdf2 is deliberately slow, so every user shares one hash
+    hashed_password = generate_password_hash(PASSWORD, method='pbkdf2:sha256')
+    usernames = [f"user{index}@loadtest.example" for index in range(sizes['users'])]
+    start = datetime.datetime(2024, 1, 1)
+
+    organizations = [{
+        'organization_id': uuid.uuid4().hex[:6],
+        'organization_name': f"Seed Org {index}",
+        'created_by': usernames[index % len(usernames)],
+        'created_at': (start + datetime.timedelta(minutes=index)).isoformat()
+    } for index in range(sizes['organizations'])]
+    memberships = [
+        {'username': organization['created_by'], 'organization_id': organization['organization_id'], 'status': 'active'}
+        for organization in organizations
+    ]
+
+    pairs = set()
+    while len(pairs) < sizes['partnerships']:
+        demand, supply = rng.sample(range(len(organizations)), 2)
+        if (supply, demand) not in pairs:
+            pairs.add((demand, supply))
+    partnerships = [{
+        'partnership_id': uuid.uuid4().hex[:6],
+        'demand_org_id': organizations[demand]['organization_id'],
+        'supply_org_id': organizations[supply]['organization_id']
+    } for demand, supply in pairs]
+
+    store = client.store
+    store.insert_rows(f"{project}.users.users", [{'username': name, 'hashed_password': hashed_password} for name in usernames])
+    store.insert_rows(f"{project}.organizations.organizations", organizations)
+    store.insert_rows(f"{project}.users.user_organization", memberships)
+    store.insert_rows(f"{project}.organizations.partnerships", partnerships)
+    store.rebuild_partnership_view()
+
+    names_by_user = {}
+    for organization in organizations:
+        names_by_user.setdefault(organization['created_by'], []).append(organization['organization_name'])
+    return usernames, names_by_user, [organization['organization_name'] for organization in organizations]
+
+def issue_token(username):
+    """A token as auth/login issues it, without paying for pbkdf2 on every user"""
+    return jwt.encode({
+        'username': username,
+        'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=1),
+        'jti': uuid.uuid4().hex
+    }, SECRET_KEY)
+
+def endpoints(usernames, names_by_user, organization_names, tokens, rng):
+    """(name, number of requests relative to --requests, make_request(sequence number) -> (method, path, kwargs))"""
+    run_id = uuid.uuid4().hex[:6]
+
+    def as_user(index):
+        username = usernames[index % len(usernames)]
+        return username, {'x-access-token': tokens[username]}
+
+    def login(index):
+        return 'post', '/auth/login', {'json': {'username': usernames[index % len(usernames)], 'password': PASSWORD}}
+
+    def protected(index):
+        return 'get', '/auth/protected', {'headers': as_user(index)[1]}
+
+    def list_organizations(index):
+        return 'get', '/organizations/list', {'headers': as_user(index)[1], 'query_string': {'limit': 100}}
+
+    def list_partnerships(index):
+        return 'get', '/organizations/partnerships/list', {'headers': as_user(index)[1], 'query_string': {'limit': 100}}
+
+    def create_organization(index):
+        return 'post', '/organizations/create', {
+            'headers': as_user(index)[1], 'json': {'organization_name': f"Load Org {run_id} {index}"}
+        }
+
+    def create_partnership(index):
+        username, headers = as_user(index)
+        demand_org_name = rng.choice(names_by_user[username])
+        supply_org_name = rng.choice([name for name in rng.sample(organization_names, 2) if name != demand_org_name])
+        return 'post', '/organizations/partnerships/create', {'headers': headers, 'json': {
+            'demand_org_name': demand_org_name,
+            'supply_org_name': supply_org_name
+        }}
+
+    def map_user(index):
+        return 'post', '/organizations/map_user', {
+            'headers': as_user(index)[1], 'json': {'organization_name': rng.choice(organization_names)}
+        }
+
+    return [
+        ('auth/login', 0.05, login),
+        ('auth/protected', 1, protected),
+        ('organizations/list', 1, list_organizations),
+        ('organizations/partnerships/list', 1, list_partnerships),
+        ('organizations/create', 0.5, create_organization),
+        ('organizations/partnerships/create', 0.5, create_partnership),
+        ('organizations/map_user', 0.5, map_user)
+    ]
+
+def percentile(timings, fraction):
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))]
+
+def drive(app, make_request, indices, concurrency):
+    """Send a request per index from `concurrency` threads; returns (latencies in ms, status counts, elapsed seconds)"""
+    local = threading.local()
+    statuses = {}
+    lock = threading.Lock()
+
+    def send(index):
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+        method, path, kwargs = make_request(index)
+        start = time.perf_counter()
+        response = getattr(local.client, method)(path, **kwargs)
+        response.get_data()  # drain streamed bodies
+        elapsed = (time.perf_counter() - start) * 1000
+        with lock:
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        return elapsed
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(send, indices))
+    return latencies, statuses, time.perf_counter() - start
+
+def run_scale(app, scale, args, rng):
+    bigquery = gcp_fakes.FakeBigQueryClient(latency=args.bigquery_latency / 1000)
+    clients.set_bigquery_client(bigquery)
+    database.set_backend(BigQueryBackend(os.environ['GCP_PROJECT']))
+
+    start = time.perf_counter()
+    usernames, names_by_user, organization_names = seed(bigquery, scale, rng)
+    print(f"\n{scale}: seeded {SCALES[scale]} in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    tokens = {username: issue_token(username) for username in usernames}
+    query_profiler.reset()
+
+    results = []
+    for name, share, make_request in endpoints(usernames, names_by_user, organization_names, tokens, rng):
+        if args.endpoints and name not in args.endpoints:
+            continue
+        count = max(1, int(args.requests * share))
+        # Warm caches and threads with requests of their own, so writes do not repeat a measured one
+        drive(app, make_request, range(count, count + min(count, args.concurrency)), args.concurrency)
+        queries_before = bigquery.queries + bigquery.inserts
+        latencies, statuses, elapsed = drive(app, make_request, range(count), args.concurrency)
+        latencies.sort()
+        result = {
+            'scale': scale,
+            'endpoint': name,
+            'requests': count,
+            'concurrency': args.concurrency,
+            'statuses': {str(status): total for status, total in sorted(statuses.items())},
+            'requests_per_second': round(count / elapsed, 2),
+            'mean_ms': round(statistics.mean(latencies), 3),
+            'p50_ms': round(percentile(latencies, 0.50), 3),
+            'p95_ms': round(percentile(latencies, 0.95), 3),
+            'p99_ms': round(percentile(latencies, 0.99), 3),
+            'max_ms': round(latencies[-1], 3),
+            'bigquery_calls_per_request': round((bigquery.queries + bigquery.inserts - queries_before) / count, 2)
+        }
+        results.append(result)
+        print(f"  {name:<36} {result['requests_per_second']:9.1f} req/s  p50={result['p50_ms']:8.2f}ms  "
+              f"p95={result['p95_ms']:8.2f}ms  p99={result['p99_ms']:8.2f}ms  "
+              f"bq/req={result['bigquery_calls_per_request']:<5} {result['statuses']}", file=sys.stderr)
+    return results, query_profiler.stats()
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {(result['scale'], result['endpoint']): result for result in json.load(f)['results']}
+    print(f"\nchange against {baseline_path}", file=sys.stderr)
+    for result in results:
+        before = baseline.get((result['scale'], result['endpoint']))
+        if not before:
+            continue
+        changes = "  ".join(
+            f"{key}={(result[key] - before[key]) / before[key]:+.0%}" if before[key] else f"{key}=n/a"
+            for key in ('requests_per_second', 'p50_ms', 'p95_ms', 'p99_ms')
+        )
+        print(f"  {result['scale']:<7} {result['endpoint']:<36} {changes}", file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', default='small,medium', help=f"comma-separated, of {', '.join(SCALES)}")
+    parser.add_argument('--requests', type=int, default=200, help="requests per read endpoint; writes and logins send fewer")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--endpoints', type=lambda value: value.split(','), help="only these routes, comma-separated")
+    parser.add_argument('--bigquery-latency', type=float, default=0, help="milliseconds per query or insert")
+    parser.add_argument('--gcs-latency', type=float, default=0, help="milliseconds per audit upload")
+    parser.add_argument('--secret-latency', type=float, default=0, help="milliseconds per secret fetch")
+    parser.add_argument('--partnership-view', choices=('off', 'maintain', 'read'), default=partnership_view.PARTNERSHIP_VIEW,
+                        help="maintain the per-user partnership view on writes, and list from it with 'read'")
+    parser.add_argument('--keep-rate-limits', action='store_true', help="enforce route rate limits, which otherwise shed most of the load")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="write the results as JSON to this file instead of stdout")
+    parser.add_argument('--compare', help="JSON results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    secret_provider.get_provider().backend._client = gcp_fakes.FakeSecretManagerClient(
+        {'SECRET_KEY': SECRET_KEY}, latency=args.secret_latency / 1000
+    )
+    secret_provider.invalidate()
+    storage = gcp_fakes.FakeStorageClient(latency=args.gcs_latency / 1000)
+    clients.set_storage_client(storage)
+    partnership_view.PARTNERSHIP_VIEW = args.partnership_view
+    if not args.keep_rate_limits:
+        for route in router.ROUTES.values():
+            route.limits = []
+
+    app = api_main.create_app()
+    results = []
+    queries = {}
+    for scale in args.scales.split(','):
+        scale_results, queries[scale] = run_scale(app, scale, args, rng)
+        results.extend(scale_results)
+    audit.flush()
+
+    report = {
+        'commit': git_commit(),
+        'created_at': datetime.datetime.utcnow().isoformat(),
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'audit_uploads': storage.uploads,
+        'results': results,
+        'queries': queries
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nwrote {args.output}", file=sys.stderr)
+    else:
+        print(json.dumps(report, indent=2))
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == '__main__':
+    main()
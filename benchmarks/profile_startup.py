@@ -0,0 +1,87 @@
+"""Report the import cost of the Cloud Function entry point, per module and per package.
+
+Each run imports the module in a fresh interpreter with `-X importtime`, as a
+cold start would:
+
+    python benchmarks/profile_startup.py --top 20
+
+With --warmup, the warm-up steps (clients, secrets, executor) are also run and
+timed after the import; they need the same credentials as the deployed function.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api')
+
+def import_times(module, env):
+    """Import `module` in a fresh interpreter; returns [(name, self_us, cumulative_us, depth)]"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+        cwd=API_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise SystemExit(result.stderr)
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+def run_warmup(env):
+    code = "import warmup\nfor name, seconds in warmup.warm_up().items(): print(f'{name:<10} {seconds * 1000:9.1f}ms')"
+    subprocess.run([sys.executable, '-c', code], cwd=API_DIR, env=env, check=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default='main')
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--warmup', action='store_true', help="also time the warm-up steps")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault('SECRET_BACKEND', 'local')  # importing must not need credentials
+
+    runs = [import_times(args.module, env) for _ in range(args.repeat)]
+    totals = [sum(self_us for _, self_us, _, _ in rows) / 1000 for rows in runs]
+    print(f"import {args.module}: p50={statistics.median(totals):.1f}ms  min={min(totals):.1f}ms  ({args.repeat} runs)")
+
+    # Per-module and per-package figures are medians over the runs
+    modules = {}
+    packages = {}
+    for rows in runs:
+        run_packages = {}
+        for name, self_us, cumulative_us, depth in rows:
+            modules.setdefault(name, []).append((self_us, cumulative_us))
+            package = name.split('.')[0]
+            run_packages[package] = run_packages.get(package, 0) + self_us
+        for package, self_us in run_packages.items():
+            packages.setdefault(package, []).append(self_us)
+
+    print(f"\ntop {args.top} packages by self time")
+    by_package = sorted(((statistics.median(times) / 1000, package) for package, times in packages.items()), reverse=True)
+    for ms, package in by_package[:args.top]:
+        print(f"  {ms:9.1f}ms  {package}")
+
+    print(f"\ntop {args.top} modules by cumulative time")
+    by_module = sorted(
+        ((statistics.median(c for _, c in times) / 1000, statistics.median(s for s, _ in times) / 1000, name)
+         for name, times in modules.items()),
+        reverse=True
+    )
+    for cumulative_ms, self_ms, name in by_module[:args.top]:
+        print(f"  {cumulative_ms:9.1f}ms  (self {self_ms:7.1f}ms)  {name}")
+
+    if args.warmup:
+        print("\nwarm-up steps")
+        run_warmup(env)
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,11 @@
 // const apiDomain = 'https://ocl-api.sullhouse.com';
 const apiDomain = 'http://127.0.0.1:5000';
 
+// Number of rows requested per page from the list endpoints
+const pageSize = 100;
+let organizationsCursor = null;
+let partnershipsCursor = null;
+
 // Validation helper functions
 function validateUsername(username) {
     if (!username || typeof username !== 'string') {
@@ -47,6 +52,11 @@ function validatePassword(password) {
     return { valid: true };
 }
 
+// Handlers report errors as { message }; the router (tokens, rate limits, server errors) as { error: { code, message } }
+function errorMessage(data) {
+    return data.message || (data.error && data.error.message) || 'Request failed';
+}
+
 async function refreshToken() {
     const token = getCookie('token');
     if (!token) {
@@ -66,18 +76,23 @@ async function refreshToken() {
         document.cookie = `token=${data.token}; path=/`;
         alert('Token refreshed successfully!');
     } else {
-        alert(data.message);
+        alert(errorMessage(data));
     }
 }
 
-async function fetchOrganizations() {
+async function fetchOrganizations(cursor = null) {
     const token = getCookie('token');
     if (!token) {
         alert('No token found. Please log in first.');
         return;
     }
 
-    const response = await fetch(`${apiDomain}/organizations/list`, {
+    const params = new URLSearchParams({ limit: pageSize });
+    if (cursor) {
+        params.set('cursor', cursor);
+    }
+
+    const response = await fetch(`${apiDomain}/organizations/list?${params}`, {
         method: 'GET',
         headers: {
             'x-access-token': token
@@ -86,20 +101,27 @@ async function fetchOrganizations() {
 
     const data = await response.json();
     if (response.ok) {
-        displayOrganizations(data.organizations);
+        displayOrganizations(data.organizations, Boolean(cursor));
+        organizationsCursor = data.next_cursor;
+        document.getElementById('load-more-organizations').style.display = organizationsCursor ? 'inline-block' : 'none';
     } else {
-        alert(data.message);
+        alert(errorMessage(data));
     }
 }
 
-async function fetchPartnerships() {
+async function fetchPartnerships(cursor = null) {
     const token = getCookie('token');
     if (!token) {
         alert('No token found. Please log in first.');
         return;
     }
 
-    const response = await fetch(`${apiDomain}/organizations/partnerships/list`, {
+    const params = new URLSearchParams({ limit: pageSize });
+    if (cursor) {
+        params.set('cursor', cursor);
+    }
+
+    const response = await fetch(`${apiDomain}/organizations/partnerships/list?${params}`, {
         method: 'GET',
         headers: {
             'x-access-token': token
@@ -108,15 +130,19 @@ async function fetchPartnerships() {
 
     const data = await response.json();
     if (response.ok) {
-        displayPartnerships(data.partnerships);
+        displayPartnerships(data.partnerships, Boolean(cursor));
+        partnershipsCursor = data.next_cursor;
+        document.getElementById('load-more-partnerships').style.display = partnershipsCursor ? 'inline-block' : 'none';
     } else {
-        alert(data.message);
+        alert(errorMessage(data));
     }
 }
 
-function displayOrganizations(organizations) {
+function displayOrganizations(organizations, append = false) {
     const orgList = document.getElementById('organization-list');
-    orgList.innerHTML = '';
+    if (!append) {
+        orgList.innerHTML = '';
+    }
     organizations.forEach(org => {
         const li = document.createElement('li');
         li.textContent = `${org.organization_name} (Created by: ${org.created_by})`;
@@ -124,9 +150,11 @@ function displayOrganizations(organizations) {
     });
 }
 
-function displayPartnerships(partnerships) {
+function displayPartnerships(partnerships, append = false) {
     const partnershipList = document.getElementById('partnership-list');
-    partnershipList.innerHTML = '';
+    if (!append) {
+        partnershipList.innerHTML = '';
+    }
     partnerships.forEach(partnership => {
         const li = document.createElement('li');
         li.textContent = `${partnership.demand_organization.organization_name} <-> ${partnership.supply_organization.organization_name}`;
@@ -134,6 +162,14 @@ function displayPartnerships(partnerships) {
     });
 }
 
+document.getElementById('load-more-organizations').addEventListener('click', function() {
+    fetchOrganizations(organizationsCursor);
+});
+
+document.getElementById('load-more-partnerships').addEventListener('click', function() {
+    fetchPartnerships(partnershipsCursor);
+});
+
 document.getElementById('add-organization-form').addEventListener('submit', async function(event) {
     event.preventDefault();
     const orgName = document.getElementById('new-organization-name').value;
@@ -152,7 +188,7 @@ document.getElementById('add-organization-form').addEventListener('submit', asyn
         alert('Organization created successfully!');
         fetchOrganizations();
     } else {
-        alert(data.message);
+        alert(errorMessage(data));
     }
 });
 
@@ -175,7 +211,7 @@ document.getElementById('add-partnership-form').addEventListener('submit', async
         alert('Partnership created successfully!');
         fetchPartnerships();
     } else {
-        alert(data.message);
+        alert(errorMessage(data));
     }
 });
 
@@ -221,7 +257,7 @@ document.getElementById('login-form').addEventListener('submit', async function(
         alert('Login successful!');
         showHomeView();
     } else {
-        alert(data.message);
+        alert(errorMessage(data));
     }
 });
 
@@ -257,7 +293,7 @@ document.getElementById('register-form').addEventListener('submit', async functi
         alert('Registration successful! You can now log in.');
         showLoginForm();
     } else {
-        alert(data.message);
+        alert(errorMessage(data));
     }
 });
 
@@ -279,7 +315,7 @@ document.getElementById('protected-button').addEventListener('click', async func
     if (response.ok) {
         alert(`Protected endpoint response: ${data.message}`);
     } else {
-        alert(data.message);
+        alert(errorMessage(data));
     }
 });
 
@@ -0,0 +1,61 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api'))
+
+import database
+import partnership_listing
+from database_sqlite import SQLiteBackend
+
+def page_through(username, page_size):
+    """Pages as organizations.list_partnerships serves them: limit + 1 rows, cursor after the last one returned"""
+    pages = []
+    after = None
+    while True:
+        partnerships = partnership_listing.list_partnerships_for_user(username, limit=page_size + 1, after=after)
+        page = [partnership['partnership_id'] for partnership in partnerships[:page_size]]
+        pages.append(page)
+        if len(partnerships) <= page_size:
+            return pages
+        after = page[-1]
+
+class ListPartnershipsForUserTest(unittest.TestCase):
+    def setUp(self):
+        self.backend = SQLiteBackend(':memory:')
+        database.set_backend(self.backend)
+        self.backend.insert_rows('organizations.organizations', [
+            {'organization_id': org_id, 'organization_name': org_id, 'created_by': 'seed', 'created_at': '2024-01-01T00:00:00'}
+            for org_id in ('mine', 'other')
+        ])
+        self.backend.insert_rows('users.user_organization', [{'username': 'u', 'organization_id': 'mine', 'status': 'active'}])
+
+    def tearDown(self):
+        database.set_backend(None)
+
+    def add_partnerships(self, demand_org_id, supply_org_id, partnership_ids):
+        self.backend.insert_rows('organizations.partnerships', [
+            {'partnership_id': partnership_id, 'demand_org_id': demand_org_id, 'supply_org_id': supply_org_id}
+            for partnership_id in partnership_ids
+        ])
+
+    def test_pages_skip_no_partnership_when_refs_point_at_a_missing_organization(self):
+        self.add_partnerships('mine', 'other', ['p01', 'p04', 'p05', 'p06'])
+        self.add_partnerships('mine', 'gone', ['p02', 'p03'])
+        self.add_partnerships('other', 'mine', ['p10', 'p11', 'p12', 'p13'])
+
+        pages = page_through('u', 3)
+
+        self.assertEqual(pages, [['p01', 'p04', 'p05'], ['p06', 'p10', 'p11'], ['p12', 'p13']])
+
+    def test_unpaged_listing_drops_refs_to_a_missing_organization(self):
+        self.add_partnerships('mine', 'other', ['p01'])
+        self.add_partnerships('mine', 'gone', ['p02'])
+        self.add_partnerships('other', 'mine', ['p03'])
+
+        partnerships = partnership_listing.list_partnerships_for_user('u')
+
+        self.assertEqual(sorted(partnership['partnership_id'] for partnership in partnerships), ['p01', 'p03'])
+
+if __name__ == '__main__':
+    unittest.main()